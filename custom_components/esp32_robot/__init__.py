@@ -3,25 +3,106 @@ import logging
 import os
 import voluptuous as vol
 import asyncio
+import json
+import time
+from email.utils import formatdate
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.components.http import HomeAssistantView, StaticPathConfig
-from homeassistant.components.sensor import DOMAIN as SENSOR_DOMAIN
-from homeassistant.helpers import entity_registry
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.helpers import config_validation as cv
 import aiohttp
 import async_timeout
-from .const import DOMAIN
+from .const import (
+    DOMAIN,
+    CONF_FLEET_MODE,
+    CONF_FLEET_CONCURRENCY,
+    CONF_FLEET_DEADLINE,
+    CONF_IP_ADDRESS,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_CONTROL_CONNECTIONS,
+    CONF_STREAM_CONNECTIONS,
+    CONF_SNAPSHOT_TTL,
+    CONF_CONTROL_RATE,
+    CONF_MAX_BODY_SIZE,
+    CONF_MOTION_DEADLINE,
+    CONF_DEADMAN_TIMEOUT,
+    CONF_RECORDING,
+    CONF_RECORDING_SIZE,
+    CONF_METRICS_SAMPLE_RATE,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_CONTROL_CONNECTIONS,
+    DEFAULT_STREAM_CONNECTIONS,
+    DEFAULT_SNAPSHOT_TTL,
+    DEFAULT_CONTROL_RATE,
+    DEFAULT_MAX_BODY_SIZE,
+    DEFAULT_MOTION_DEADLINE,
+    DEFAULT_DEADMAN_TIMEOUT,
+    DEFAULT_FLEET_CONCURRENCY,
+    DEFAULT_FLEET_DEADLINE,
+    DEFAULT_RECORDING_SIZE,
+    DEFAULT_METRICS_SAMPLE_RATE,
+)
 from .sensor import ESP32RobotSensor
+from .session import ESP32RobotSessions
+from .stream import (
+    ESP32RobotStreamHub,
+    FRAME_BOUNDARY,
+    MAX_TIER_FPS,
+    MIN_TIER_FPS,
+    encode_frame,
+)
+from .control import (
+    ESP32RobotCommandScheduler,
+    OUTCOME_SENT,
+    OUTCOME_SUPERSEDED,
+    OUTCOME_EXPIRED,
+)
+from .metrics import ESP32RobotMetrics, path_group
+from .recorder import ESP32RobotRecorder, async_remove_recordings
+from .routing import ESP32RobotRouter
+from .fleet import ESP32RobotFleetPoller
+from .websocket_api import async_register_websocket_commands
 from .frontend import async_setup_frontend
-from pathlib import Path
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = ["sensor"]
 
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(CONF_FLEET_MODE, default=False): cv.boolean,
+                vol.Optional(
+                    CONF_FLEET_CONCURRENCY, default=DEFAULT_FLEET_CONCURRENCY
+                ): cv.positive_int,
+                vol.Optional(
+                    CONF_FLEET_DEADLINE, default=DEFAULT_FLEET_DEADLINE
+                ): cv.positive_int,
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the ESP32 Robot component from configuration.yaml."""
     hass.data.setdefault(DOMAIN, {})
+    hass.data[DOMAIN]["router"] = ESP32RobotRouter(hass)
+    
+    # Fleet mode: one shared poller instead of a timer per robot
+    conf = config.get(DOMAIN, {})
+    if conf.get(CONF_FLEET_MODE):
+        hass.data[DOMAIN]["fleet"] = ESP32RobotFleetPoller(
+            hass,
+            concurrency=conf[CONF_FLEET_CONCURRENCY],
+            deadline=conf[CONF_FLEET_DEADLINE],
+        )
+    
+    async_register_websocket_commands(hass)
+    
+    # Register view for API endpoints, shared by all robots
+    hass.http.register_view(ESP32RobotProxyView(hass))
     
     # Setup frontend for Lovelace card
     await async_setup_frontend(hass)
@@ -30,29 +111,126 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up ESP32 Robot from a config entry."""
-    hass.data.setdefault(DOMAIN, {})
-    
-    # Register view for API endpoints
-    hass.http.register_view(ESP32RobotProxyView(hass))
+    started = time.monotonic()
     
-    # Forward to sensor platform
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    metrics = ESP32RobotMetrics(
+        sample_rate=entry.options.get(CONF_METRICS_SAMPLE_RATE, DEFAULT_METRICS_SAMPLE_RATE) / 100
+    )
     
-    # Register frontend resources
-    lovelace_path = str(Path(__file__).parent / "lovelace")
-    await hass.http.async_register_static_paths([
-        StaticPathConfig(
-            f"/esp32_robot/frontend",
-            lovelace_path,
-            False
+    # One set of pooled upstream connections per robot, reused by the proxy
+    sessions = ESP32RobotSessions(
+        entry.data[CONF_IP_ADDRESS],
+        keepalive_timeout=entry.options.get(
+            CONF_KEEPALIVE_TIMEOUT, DEFAULT_KEEPALIVE_TIMEOUT
+        ),
+        control_connections=entry.options.get(
+            CONF_CONTROL_CONNECTIONS, DEFAULT_CONTROL_CONNECTIONS
+        ),
+        stream_connections=entry.options.get(
+            CONF_STREAM_CONNECTIONS, DEFAULT_STREAM_CONNECTIONS
+        ),
+        trace_config=metrics.trace_config(),
+    )
+    stream_hub = ESP32RobotStreamHub(
+        hass,
+        sessions,
+        snapshot_ttl=entry.options.get(CONF_SNAPSHOT_TTL, DEFAULT_SNAPSHOT_TTL),
+        metrics=metrics,
+    )
+    recorder = None
+    if entry.options.get(CONF_RECORDING, False):
+        recorder = ESP32RobotRecorder(
+            hass,
+            stream_hub,
+            _recordings_path(hass, entry),
+            max_size=entry.options.get(CONF_RECORDING_SIZE, DEFAULT_RECORDING_SIZE) * 1024 * 1024,
         )
-    ])
+    hass.data[DOMAIN][entry.entry_id] = {
+        "sessions": sessions,
+        "stream_hub": stream_hub,
+        "recorder": recorder,
+        "metrics": metrics,
+        "commands": ESP32RobotCommandScheduler(
+            hass,
+            sessions,
+            rate=entry.options.get(CONF_CONTROL_RATE, DEFAULT_CONTROL_RATE),
+            motion_deadline=entry.options.get(CONF_MOTION_DEADLINE, DEFAULT_MOTION_DEADLINE) / 1000,
+            deadman_timeout=entry.options.get(CONF_DEADMAN_TIMEOUT, DEFAULT_DEADMAN_TIMEOUT) / 1000,
+            metrics=metrics,
+        ),
+        "max_body_size": entry.options.get(CONF_MAX_BODY_SIZE, DEFAULT_MAX_BODY_SIZE) * 1024 * 1024,
+    }
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    if recorder is not None:
+        # Loads the existing ring in the background, then joins the stream
+        recorder.async_start()
+    runtime_ready = time.monotonic()
     
+    # Forward to sensor platform; the first status poll runs in the background
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    
+    _LOGGER.debug(
+        "Set up %s in %.3fs (runtime %.3fs, platforms %.3fs)",
+        entry.title,
+        time.monotonic() - started,
+        runtime_ready - started,
+        time.monotonic() - runtime_ready,
+    )
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    
+    if unload_ok:
+        robot = hass.data[DOMAIN].pop(entry.entry_id)
+        if robot["recorder"] is not None:
+            await robot["recorder"].async_stop()
+        await robot["commands"].async_stop()
+        await robot["stream_hub"].async_stop()
+        await robot["sessions"].async_close()
+    
+    return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the camera recordings of a removed robot."""
+    await async_remove_recordings(hass, _recordings_path(hass, entry))
+
+def _recordings_path(hass, entry):
+    """Return the directory holding the camera recordings of a robot."""
+    return hass.config.path(DOMAIN, "recordings", entry.entry_id)
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload a config entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+# Headers of the client request that are not passed on to the robot
+REQUEST_HEADERS_EXCLUDED = {
+    'host', 'authorization', 'connection', 'keep-alive', 'transfer-encoding',
+}
+
+# Headers of the robot response that are not passed on to the client
+RESPONSE_HEADERS_EXCLUDED = {
+    'connection', 'keep-alive', 'transfer-encoding', 'content-length',
+}
+
+# Settings writes scheduled as commands, keyed by path
+SETTINGS_PATHS = ("quality", "led")
+
+# Control payloads are a few dozen bytes
+MAX_CONTROL_BODY_SIZE = 4096
+
+# Request key set when a streamed request body went over the size limit;
+# the error surfaces wrapped by the client's body writer, if at all
+BODY_TOO_LARGE = "esp32_robot_body_too_large"
+
+
+def _is_scheduled(method, path):
+    """Return True if a request is sent through the robot's command scheduler."""
+    return (method == "POST" and path == "control") or (
+        method == "GET" and path in SETTINGS_PATHS
+    )
+
 
 class ESP32RobotProxyView(HomeAssistantView):
     """View to handle ESP32 Robot requests."""
@@ -64,6 +242,7 @@ class ESP32RobotProxyView(HomeAssistantView):
     def __init__(self, hass):
         """Initialize the proxy view."""
         self.hass = hass
+        self._router = hass.data[DOMAIN]["router"]
     
     async def get(self, request, sensor_id, path):
         """Handle GET requests to the robot."""
@@ -76,141 +255,367 @@ class ESP32RobotProxyView(HomeAssistantView):
     async def _proxy_request(self, request, sensor_id, path, method):
         """Proxy requests to the robot."""
         try:
-            # Debug sensor domain and hass.data keys
-            _LOGGER.debug("SENSOR_DOMAIN = %s", SENSOR_DOMAIN)
-            _LOGGER.debug("hass.data keys: %s", list(self.hass.data.keys()))
-            
-            # Reconstruct full entity_id
-            full_entity_id = f"sensor.{sensor_id}"
-            _LOGGER.debug("Looking for sensor entity with ID: %s", full_entity_id)
+            route = self._router.async_get(sensor_id)
+            if route is None:
+                return self.json_message("Sensor not found", 404)
             
-            # First try to get the entity from the entity registry
-            er = entity_registry.async_get(self.hass)
-            entity_entry = er.async_get(full_entity_id)
+            # Only a sampled fraction of requests is timed
+            metrics = route.robot["metrics"]
+            started = metrics.start()
+            response = None
+            try:
+                response = await self._handle_request(request, route, path, method, started)
+                return response
+            finally:
+                # Multipart streams (camera, recording playback, relayed MJPEG)
+                # last minutes; the camera stream is timed to its first frame
+                # and relayed ones to their first byte instead. Scheduled
+                # commands are timed by the scheduler, for WebSocket clients too.
+                if path != "stream" and not _is_scheduled(method, path) and not (
+                    response is not None and response.content_type.startswith("multipart/")
+                ):
+                    metrics.observe(metrics.latency[path_group(path)], started)
+                
+        except Exception as e:
+            _LOGGER.error("Unexpected error in proxy request: %s", str(e))
+            return self.json_message(f"Server error: {str(e)}", 500)
+
+    async def _handle_request(self, request, route, path, method, started):
+        """Serve a request for a robot, from Home Assistant or the robot itself."""
+        # Recordings stay available while the robot is offline
+        if method == "GET" and (path == "recording" or path.startswith("recording/")):
+            return await self._serve_recording(request, route.robot["recorder"], path)
+        
+        # Check if robot is online based on the sensor state
+        if not route.online:
+            return self.json_message("Robot is offline", 503)
+        
+        robot = route.robot
+        ip_address = route.ip_address
+        session = robot["sessions"].session_for(path)
+        
+        # The camera stream is shared between all viewers through the hub
+        if method == "GET" and path == "stream":
+            return await self._relay_stream(request, robot["stream_hub"], robot["metrics"], started)
+        if method == "GET" and path == "snapshot":
+            return await self._serve_snapshot(request, robot["stream_hub"])
+        if method == "GET" and path == "status":
+            # Served from the coordinator's last poll instead of asking the robot again
+            return self.json(robot["coordinator"].data)
+        if method == "GET" and path == "stopstream":
+            # The hub closes the upstream stream after its last viewer leaves,
+            # stopping it here would cut off the other viewers
+            return self.json({"status": "ok"})
+        
+        # Commands go through the robot's scheduler so a stop is never stuck
+        # behind a settings change and stale joystick vectors are dropped
+        if method == "POST" and path == "control":
+            robot["coordinator"].async_mark_active()
+            return await self._schedule_control(request, robot["commands"])
+        if method == "GET" and path in SETTINGS_PATHS:
+            return self._command_response(
+                await robot["commands"].submit_setting(path, path, dict(request.query))
+            )
+        
+        # Forward request to robot
+        url = f"http://{ip_address}/{path}"
+        _LOGGER.debug("Forwarding request to robot at %s: %s %s", ip_address, method, path)
+        max_body_size = robot["max_body_size"]
+        metrics = robot["metrics"]
+        
+        try:
+            # Request bodies are streamed to the robot as they arrive
+            data = None
+            if method == "POST":
+                if request.content_length is not None and request.content_length > max_body_size:
+                    return self.json_message("Request body too large", 413)
+                data = self._stream_request_body(request, max_body_size)
             
-            if entity_entry:
-                _LOGGER.debug("Found entity in registry: %s (platform: %s)", 
-                             entity_entry.entity_id, entity_entry.platform)
-            else:
-                _LOGGER.debug("Entity not found in registry: %s", full_entity_id)
+            # Copy original headers (except host, authorization and
+            # hop-by-hop headers that would defeat the connection pool)
+            headers = {}
+            for name, value in request.headers.items():
+                if name.lower() not in REQUEST_HEADERS_EXCLUDED:
+                    headers[name] = value
             
-            # Try to get the entity state directly
-            state = self.hass.states.get(full_entity_id)
-            entity = None
+            # Get query parameters
+            params = dict(request.query)
             
-            if state is not None:
-                _LOGGER.debug("Found entity state by direct lookup: %s (state: %s)", full_entity_id, state.state)
-                _LOGGER.debug("State attributes: %s", state.attributes)
-                
-                # Try to get the IP address from state attributes
-                ip_address = state.attributes.get('ip_address')
+            # Reuse the robot's pooled session; stream requests get the
+            # stream pool, which has no total timeout
+            sent = time.monotonic() if started is not None else None
+            async with session.request(method, url, params=params, data=data, headers=headers) as response:
+                metrics.observe(metrics.time_to_first_byte, sent)
+                content_type = response.headers.get('Content-Type', 'application/json')
+                _LOGGER.debug("Response content type: %s for path: %s", content_type, path)
                 
-                if ip_address:
-                    _LOGGER.debug("Using IP address from state attributes: %s", ip_address)
+                if 'multipart/x-mixed-replace' in content_type:
+                    # For MJPEG streams, we need to create a streaming response
+                    _LOGGER.debug("Handling MJPEG stream from %s", url)
                     
-                    # Check if robot is online based on state value
-                    if state.state != "online":
-                        return self.json_message("Robot is offline", 503)
+                    # Create a response object with the same headers
+                    resp = aiohttp.web.StreamResponse(status=response.status)
+                    for name, value in response.headers.items():
+                        if name.lower() not in ('transfer-encoding',):
+                            resp.headers[name] = value
                     
-                    # Forward request to robot
-                    url = f"http://{ip_address}/{path}"
-                    _LOGGER.debug("Forwarding request to robot at %s: %s %s", ip_address, method, path)
+                    # Start the response
+                    await resp.prepare(request)
+                    _LOGGER.debug("MJPEG stream response prepared")
                     
+                    # Stream the content with proper error handling, passing
+                    # on whatever has arrived; resp.write() applies backpressure
                     try:
-                        # Increased timeout for stream requests - MJPEG streams can run indefinitely
-                        stream_timeout = None if path == "stream" else 30
-                        
-                        data = None
-                        if method == "POST":
-                            data = await request.read()
-                        
-                        # Copy original headers (except host and authorization)
-                        headers = {}
-                        for name, value in request.headers.items():
-                            if name.lower() not in ('host', 'authorization'):
-                                headers[name] = value
-                        
-                        # Get query parameters
-                        params = dict(request.query)
-                        
-                        # Create a client session and make the request
-                        connector = aiohttp.TCPConnector(force_close=False)  # Keep connections alive
-                        client_timeout = aiohttp.ClientTimeout(total=stream_timeout)
-                        
-                        async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
-                            if method == "GET":
-                                async with session.get(url, params=params, headers=headers) as response:
-                                    content_type = response.headers.get('Content-Type', 'application/json')
-                                    _LOGGER.debug("Response content type: %s for path: %s", content_type, path)
-                                    
-                                    if 'multipart/x-mixed-replace' in content_type:
-                                        # For MJPEG streams, we need to create a streaming response
-                                        _LOGGER.debug("Handling MJPEG stream from %s", url)
-                                        
-                                        # Create a response object with the same headers
-                                        resp = aiohttp.web.StreamResponse(status=response.status)
-                                        for name, value in response.headers.items():
-                                            if name.lower() not in ('transfer-encoding',):
-                                                resp.headers[name] = value
-                                        
-                                        # Start the response
-                                        await resp.prepare(request)
-                                        _LOGGER.debug("MJPEG stream response prepared")
-                                        
-                                        # Larger buffer size for better performance
-                                        buffer_size = 4096
-                                        
-                                        # Stream the content with proper error handling
-                                        try:
-                                            async for chunk in response.content.iter_chunked(buffer_size):
-                                                if chunk:  # Only process non-empty chunks
-                                                    await resp.write(chunk)
-                                                    # Small delay to avoid overwhelming the client
-                                                    await asyncio.sleep(0.001)
-                                        except ConnectionResetError:
-                                            _LOGGER.warning("Client disconnected from stream")
-                                            return resp
-                                        except asyncio.CancelledError:
-                                            _LOGGER.warning("Stream was cancelled")
-                                            return resp
-                                        except Exception as e:
-                                            _LOGGER.error("Error streaming MJPEG content: %s", str(e))
-                                            return self.json_message(f"Streaming error: {str(e)}", 500)
-                                        
-                                        _LOGGER.debug("MJPEG stream completed")
-                                        # End the response
-                                        await resp.write_eof()
-                                        return resp
-                                    elif 'image' in content_type:
-                                        # For static images, return raw content
-                                        data = await response.read()
-                                        return aiohttp.web.Response(body=data, content_type=content_type)
-                                    else:
-                                        # For other responses, return as JSON or text
-                                        text = await response.text()
-                                        return aiohttp.web.Response(text=text, content_type=content_type, status=response.status)
-                            else:  # POST
-                                async with session.post(url, params=params, data=data, headers=headers) as response:
-                                    text = await response.text()
-                                    content_type = response.headers.get('Content-Type', 'application/json')
-                                    return aiohttp.web.Response(text=text, content_type=content_type, status=response.status)
-                    
-                    except asyncio.TimeoutError:
-                        return self.json_message("Request to robot timed out", 504)
-                    except ConnectionRefusedError:
-                        return self.json_message("Connection refused by robot", 502)
+                        async for chunk in response.content.iter_any():
+                            await resp.write(chunk)
+                            metrics.bytes_relayed += len(chunk)
+                    except ConnectionResetError:
+                        _LOGGER.warning("Client disconnected from stream")
+                        return resp
+                    except asyncio.CancelledError:
+                        _LOGGER.warning("Stream was cancelled")
+                        return resp
                     except Exception as e:
-                        _LOGGER.error("Error forwarding request to robot: %s", str(e))
-                        return self.json_message(f"Error: {str(e)}", 500)
-                
-                else:
-                    _LOGGER.error("IP address not found in entity attributes")
-                    return self.json_message("Robot IP address not available", 500)
-            
-            else:
-                _LOGGER.error("Sensor state not found for ID: %s", full_entity_id)
-                return self.json_message("Sensor not found", 404)
+                        _LOGGER.error("Error streaming MJPEG content: %s", str(e))
+                        return self.json_message(f"Streaming error: {str(e)}", 500)
+                    
+                    _LOGGER.debug("MJPEG stream completed")
+                    # End the response
+                    await resp.write_eof()
+                    return resp
                 
+                # Everything else is piped through as raw bytes
+                return await self._relay_response(request, response, max_body_size, metrics)
+        
+        except asyncio.TimeoutError as e:
+            metrics.count_error(e)
+            return self.json_message("Request to robot timed out", 504)
+        except ConnectionRefusedError as e:
+            metrics.count_error(e)
+            return self.json_message("Connection refused by robot", 502)
         except Exception as e:
-            _LOGGER.error("Unexpected error in proxy request: %s", str(e))
-            return self.json_message(f"Server error: {str(e)}", 500) 
\ No newline at end of file
+            if request.get(BODY_TOO_LARGE):
+                # The client's fault, not the robot's
+                return self.json_message("Request body too large", 413)
+            metrics.count_error(e)
+            _LOGGER.error("Error forwarding request to robot: %s", str(e))
+            return self.json_message(f"Error: {str(e)}", 500)
+
+    async def _schedule_control(self, request, scheduler):
+        """Queue a /control request in the scheduler and wait for its outcome."""
+        if request.content_length is not None and request.content_length > MAX_CONTROL_BODY_SIZE:
+            return self.json_message("Request body too large", 413)
+        # Content-Length is missing for chunked bodies, count what arrives
+        body = bytearray()
+        async for chunk in request.content.iter_any():
+            body += chunk
+            if len(body) > MAX_CONTROL_BODY_SIZE:
+                return self.json_message("Request body too large", 413)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self.json_message("Invalid JSON in control command", 400)
+        if not isinstance(payload, dict):
+            return self.json_message("Invalid control command", 400)
+        return self._command_response(await scheduler.submit_control(payload))
+    
+    def _command_response(self, result):
+        """Turn a CommandResult into a response for the client."""
+        if result.outcome == OUTCOME_SENT:
+            headers = {"Content-Type": result.content_type} if result.content_type else None
+            return aiohttp.web.Response(body=result.body, status=result.status, headers=headers)
+        if result.outcome == OUTCOME_SUPERSEDED:
+            return self.json({"status": "superseded"}, 202)
+        if result.outcome == OUTCOME_EXPIRED:
+            return self.json_message("Command expired before it could be sent", 504)
+        return self.json_message("Error sending command to robot", 502)
+    
+    async def _stream_request_body(self, request, max_body_size):
+        """Yield the client's request body, enforcing the size limit."""
+        received = 0
+        async for chunk in request.content.iter_any():
+            received += len(chunk)
+            if received > max_body_size:
+                request[BODY_TOO_LARGE] = True
+                raise aiohttp.web.HTTPRequestEntityTooLarge(
+                    max_size=max_body_size, actual_size=received
+                )
+            yield chunk
+    
+    async def _relay_response(self, request, response, max_body_size, metrics):
+        """Pipe a robot response to the client without buffering or decoding it."""
+        if response.content_length is not None and response.content_length > max_body_size:
+            return self.json_message("Response from robot too large", 502)
+        
+        resp = aiohttp.web.StreamResponse(status=response.status, reason=response.reason)
+        for name, value in response.headers.items():
+            if name.lower() not in RESPONSE_HEADERS_EXCLUDED:
+                resp.headers.add(name, value)
+        if response.content_length is not None:
+            resp.content_length = response.content_length
+        await resp.prepare(request)
+        
+        relayed = 0
+        async for chunk in response.content.iter_any():
+            relayed += len(chunk)
+            if relayed > max_body_size:
+                # Headers are already sent, so the only way to signal the
+                # failure is to cut the connection before the body is complete
+                _LOGGER.warning("Response from robot exceeded %d bytes, aborting", max_body_size)
+                if request.transport is not None:
+                    request.transport.close()
+                return resp
+            await resp.write(chunk)
+            metrics.bytes_relayed += len(chunk)
+        
+        await resp.write_eof()
+        return resp
+    
+    async def _relay_stream(self, request, hub, metrics, started):
+        """Relay frames from the shared stream hub to one viewer.
+        
+        A sampled stream request is timed to its first frame. `fps` and
+        `scale` query parameters select a lower frame rate and resolution.
+        """
+        try:
+            fps = float(request.query["fps"]) if "fps" in request.query else None
+            scale = float(request.query.get("scale", 1))
+        except ValueError:
+            return self.json_message("Invalid fps or scale", 400)
+        if fps is not None and not MIN_TIER_FPS <= fps <= MAX_TIER_FPS:
+            return self.json_message(
+                f"fps must be between {MIN_TIER_FPS} and {MAX_TIER_FPS}", 400
+            )
+        if not 0 < scale <= 1:
+            return self.json_message("scale must be between 0 and 1", 400)
+
+        resp = aiohttp.web.StreamResponse()
+        resp.headers["Content-Type"] = f"multipart/x-mixed-replace; boundary={FRAME_BOUNDARY}"
+        resp.headers["Cache-Control"] = "no-cache, no-store"
+        await resp.prepare(request)
+        
+        viewer = hub.subscribe(fps, scale)
+        _LOGGER.debug("Stream viewer joined, %d viewers", hub.viewer_count)
+        try:
+            # resp.write() waits while the client is slow to drain, meanwhile
+            # newer frames replace the pending one in the viewer's slot
+            while (frame := await viewer.next_frame()) is not None:
+                part = encode_frame(frame)
+                await resp.write(part)
+                metrics.frames_delivered.add()
+                metrics.bytes_relayed += len(part)
+                if started is not None:
+                    metrics.observe(metrics.latency["stream"], started)
+                    started = None
+        except ConnectionResetError:
+            _LOGGER.debug("Client disconnected from stream")
+            return resp
+        finally:
+            hub.unsubscribe(viewer)
+            _LOGGER.debug(
+                "Stream viewer left after %d frames (%d dropped), %d viewers",
+                viewer.frames_delivered, viewer.frames_dropped, hub.viewer_count,
+            )
+        
+        await resp.write_eof()
+        return resp
+
+    async def _serve_snapshot(self, request, hub):
+        """Serve the latest frame of the robot's camera as a JPEG."""
+        snapshot = await hub.async_snapshot()
+        if snapshot is None:
+            return self.json_message("No frame available from robot", 502)
+        
+        headers = {
+            "ETag": snapshot.etag,
+            "Last-Modified": formatdate(snapshot.timestamp, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+        
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            not_modified = if_none_match.strip() == "*" or snapshot.etag in (
+                tag.strip() for tag in if_none_match.split(",")
+            )
+        else:
+            if_modified_since = request.if_modified_since
+            not_modified = (
+                if_modified_since is not None
+                and int(snapshot.timestamp) <= if_modified_since.timestamp()
+            )
+        
+        if not_modified:
+            return aiohttp.web.Response(status=304, headers=headers)
+        return aiohttp.web.Response(body=snapshot.frame, content_type="image/jpeg", headers=headers)
+
+    async def _serve_recording(self, request, recorder, path):
+        """Serve the recording summary, a recorded frame or a playback stream.
+        
+        - recording: time range and size of what is on disk
+        - recording/frame?timestamp=T: the last frame recorded at or before T
+        - recording/playback?start=S&end=E&speed=X: frames from S to E as
+          MJPEG, paced as recorded (E defaults to now, X to 1)
+        
+        Timestamps are Unix time in seconds.
+        """
+        if recorder is None:
+            return self.json_message("Recording is not enabled for this robot", 404)
+        if path == "recording":
+            return self.json(recorder.info)
+        
+        try:
+            query = request.query
+            if path == "recording/frame":
+                timestamp = int(float(query["timestamp"]) * 1000)
+            elif path == "recording/playback":
+                start = int(float(query["start"]) * 1000)
+                end = int(float(query.get("end", time.time())) * 1000)
+                speed = float(query.get("speed", 1))
+                if not 0.1 <= speed <= 16:
+                    return self.json_message("Speed must be between 0.1 and 16", 400)
+            else:
+                return self.json_message("Unknown recording endpoint", 404)
+        except (KeyError, ValueError):
+            return self.json_message("Invalid or missing timestamp", 400)
+        
+        if path == "recording/frame":
+            entry = recorder.async_frame_at(timestamp)
+            if entry is None:
+                return self.json_message("No frame recorded at this time", 404)
+            # A recorded frame never changes, so its timestamp is its ETag
+            headers = {
+                "ETag": f'"{entry[3]}"',
+                "X-Frame-Timestamp": str(entry[3] / 1000),
+                "Cache-Control": "no-cache",
+            }
+            if_none_match = request.headers.get("If-None-Match")
+            if if_none_match is not None and headers["ETag"] in (
+                tag.strip() for tag in if_none_match.split(",")
+            ):
+                return aiohttp.web.Response(status=304, headers=headers)
+            frame = await recorder.async_read_frame(entry)
+            if frame is None:
+                return self.json_message("No frame recorded at this time", 404)
+            return aiohttp.web.Response(body=frame, content_type="image/jpeg", headers=headers)
+        
+        if not recorder.async_has_frames(start, end):
+            return self.json_message("No frames recorded in this range", 404)
+        
+        resp = aiohttp.web.StreamResponse()
+        resp.headers["Content-Type"] = f"multipart/x-mixed-replace; boundary={FRAME_BOUNDARY}"
+        resp.headers["Cache-Control"] = "no-cache, no-store"
+        await resp.prepare(request)
+        
+        frames = recorder.async_playback(start, end, speed)
+        try:
+            async for _, frame in frames:
+                await resp.write(encode_frame(frame))
+        except ConnectionResetError:
+            _LOGGER.debug("Client disconnected from playback")
+            return resp
+        finally:
+            await frames.aclose()
+        
+        await resp.write_eof()
+        return resp
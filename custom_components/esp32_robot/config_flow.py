@@ -10,7 +10,41 @@ from homeassistant.core import callback
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.const import CONF_NAME
 
-from .const import DOMAIN, CONF_IP_ADDRESS, CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL
+from .const import (
+    DOMAIN,
+    CONF_IP_ADDRESS,
+    CONF_UPDATE_INTERVAL,
+    CONF_KEEPALIVE_TIMEOUT,
+    CONF_CONTROL_CONNECTIONS,
+    CONF_STREAM_CONNECTIONS,
+    CONF_SNAPSHOT_TTL,
+    CONF_CONTROL_RATE,
+    CONF_FAST_UPDATE_INTERVAL,
+    CONF_MAX_OFFLINE_INTERVAL,
+    CONF_CONNECT_TIMEOUT,
+    CONF_MAX_BODY_SIZE,
+    CONF_MOTION_DEADLINE,
+    CONF_DEADMAN_TIMEOUT,
+    CONF_RECORDING,
+    CONF_RECORDING_SIZE,
+    CONF_METRICS_SAMPLE_RATE,
+    CONF_DIAGNOSTIC_SENSORS,
+    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_CONTROL_CONNECTIONS,
+    DEFAULT_STREAM_CONNECTIONS,
+    DEFAULT_SNAPSHOT_TTL,
+    DEFAULT_CONTROL_RATE,
+    DEFAULT_FAST_UPDATE_INTERVAL,
+    DEFAULT_MAX_OFFLINE_INTERVAL,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_BODY_SIZE,
+    DEFAULT_MOTION_DEADLINE,
+    DEFAULT_DEADMAN_TIMEOUT,
+    MIN_DEADMAN_TIMEOUT,
+    DEFAULT_RECORDING_SIZE,
+    DEFAULT_METRICS_SAMPLE_RATE,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -91,17 +125,113 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         """Manage options."""
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(title="", data=user_input)
-
+            # A vector has to be allowed to wait for the next control slot,
+            # otherwise a held joystick keeps expiring
+            if user_input[CONF_MOTION_DEADLINE] < 1000 / user_input[CONF_CONTROL_RATE]:
+                errors[CONF_MOTION_DEADLINE] = "motion_deadline_too_short"
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
+
+        # Show rejected input again rather than the saved options
+        current = {**self.config_entry.options, **(user_input or {})}
         options = {
             vol.Optional(
                 CONF_UPDATE_INTERVAL,
-                default=self.config_entry.options.get(
+                default=current.get(
                     CONF_UPDATE_INTERVAL, 
                     self.config_entry.data.get(CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL)
                 ),
-            ): int,
+            ): vol.All(int, vol.Range(min=5)),
+            vol.Optional(
+                CONF_FAST_UPDATE_INTERVAL,
+                default=current.get(
+                    CONF_FAST_UPDATE_INTERVAL, DEFAULT_FAST_UPDATE_INTERVAL
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_MAX_OFFLINE_INTERVAL,
+                default=current.get(
+                    CONF_MAX_OFFLINE_INTERVAL, DEFAULT_MAX_OFFLINE_INTERVAL
+                ),
+            ): vol.All(int, vol.Range(min=5)),
+            vol.Optional(
+                CONF_CONNECT_TIMEOUT,
+                default=current.get(
+                    CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT
+                ),
+            ): vol.All(int, vol.Range(min=1, max=30)),
+            vol.Optional(
+                CONF_KEEPALIVE_TIMEOUT,
+                default=current.get(
+                    CONF_KEEPALIVE_TIMEOUT, DEFAULT_KEEPALIVE_TIMEOUT
+                ),
+            ): vol.All(int, vol.Range(min=0)),
+            vol.Optional(
+                CONF_CONTROL_CONNECTIONS,
+                default=current.get(
+                    CONF_CONTROL_CONNECTIONS, DEFAULT_CONTROL_CONNECTIONS
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_STREAM_CONNECTIONS,
+                default=current.get(
+                    CONF_STREAM_CONNECTIONS, DEFAULT_STREAM_CONNECTIONS
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_SNAPSHOT_TTL,
+                default=current.get(
+                    CONF_SNAPSHOT_TTL, DEFAULT_SNAPSHOT_TTL
+                ),
+            ): vol.All(int, vol.Range(min=0)),
+            vol.Optional(
+                CONF_CONTROL_RATE,
+                default=current.get(
+                    CONF_CONTROL_RATE, DEFAULT_CONTROL_RATE
+                ),
+            ): vol.All(int, vol.Range(min=1, max=50)),
+            vol.Optional(
+                CONF_MOTION_DEADLINE,
+                default=current.get(
+                    CONF_MOTION_DEADLINE, DEFAULT_MOTION_DEADLINE
+                ),
+            ): vol.All(int, vol.Range(min=50)),
+            vol.Optional(
+                CONF_DEADMAN_TIMEOUT,
+                default=current.get(
+                    CONF_DEADMAN_TIMEOUT, DEFAULT_DEADMAN_TIMEOUT
+                ),
+            ): vol.All(int, vol.Range(min=MIN_DEADMAN_TIMEOUT)),
+            vol.Optional(
+                CONF_MAX_BODY_SIZE,
+                default=current.get(
+                    CONF_MAX_BODY_SIZE, DEFAULT_MAX_BODY_SIZE
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_RECORDING,
+                default=current.get(CONF_RECORDING, False),
+            ): bool,
+            vol.Optional(
+                CONF_RECORDING_SIZE,
+                default=current.get(
+                    CONF_RECORDING_SIZE, DEFAULT_RECORDING_SIZE
+                ),
+            ): vol.All(int, vol.Range(min=16)),
+            vol.Optional(
+                CONF_METRICS_SAMPLE_RATE,
+                default=current.get(
+                    CONF_METRICS_SAMPLE_RATE, DEFAULT_METRICS_SAMPLE_RATE
+                ),
+            ): vol.All(int, vol.Range(min=0, max=100)),
+            vol.Optional(
+                CONF_DIAGNOSTIC_SENSORS,
+                default=current.get(CONF_DIAGNOSTIC_SENSORS, False),
+            ): bool,
         }
 
-        return self.async_show_form(step_id="init", data_schema=vol.Schema(options)) 
\ No newline at end of file
+        return self.async_show_form(
+            step_id="init", data_schema=vol.Schema(options), errors=errors
+        ) 
\ No newline at end of file
@@ -2,9 +2,48 @@
 
 DOMAIN = "esp32_robot"
 
+# configuration.yaml options, shared by all robots
+CONF_FLEET_MODE = "fleet_mode"
+CONF_FLEET_CONCURRENCY = "fleet_concurrency"
+CONF_FLEET_DEADLINE = "fleet_deadline"
+
 # Configuration constants
 CONF_IP_ADDRESS = "ip_address"
 CONF_UPDATE_INTERVAL = "update_interval"
+CONF_KEEPALIVE_TIMEOUT = "keepalive_timeout"
+CONF_CONTROL_CONNECTIONS = "control_connections"
+CONF_STREAM_CONNECTIONS = "stream_connections"
+CONF_SNAPSHOT_TTL = "snapshot_ttl"
+CONF_CONTROL_RATE = "control_rate"
+CONF_FAST_UPDATE_INTERVAL = "fast_update_interval"
+CONF_MAX_OFFLINE_INTERVAL = "max_offline_interval"
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+CONF_MAX_BODY_SIZE = "max_body_size"
+CONF_MOTION_DEADLINE = "motion_deadline"
+CONF_DEADMAN_TIMEOUT = "deadman_timeout"
+CONF_RECORDING = "recording"
+CONF_RECORDING_SIZE = "recording_size"
+CONF_METRICS_SAMPLE_RATE = "metrics_sample_rate"
+CONF_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
 
 # Default values
-DEFAULT_UPDATE_INTERVAL = 30  # seconds 
\ No newline at end of file
+DEFAULT_UPDATE_INTERVAL = 30  # seconds, polling while the robot is idle
+DEFAULT_FAST_UPDATE_INTERVAL = 2  # seconds, polling while streaming, driven or watched
+DEFAULT_MAX_OFFLINE_INTERVAL = 300  # seconds, upper bound of the offline backoff
+DEFAULT_CONNECT_TIMEOUT = 3  # seconds
+DEFAULT_READ_TIMEOUT = 10  # seconds
+DEFAULT_MAX_BODY_SIZE = 16  # MiB, per proxied request or response body
+DEFAULT_FLEET_CONCURRENCY = 8  # robots polled at the same time
+DEFAULT_FLEET_DEADLINE = 15  # seconds per robot poll
+DEFAULT_KEEPALIVE_TIMEOUT = 15  # seconds
+DEFAULT_CONTROL_CONNECTIONS = 2  # per robot, the ESP32 only has a handful of sockets
+DEFAULT_STREAM_CONNECTIONS = 2  # per robot
+DEFAULT_SNAPSHOT_TTL = 10  # seconds
+DEFAULT_CONTROL_RATE = 20  # joystick commands per second forwarded to the robot
+DEFAULT_MOTION_DEADLINE = 500  # ms a joystick vector may wait before it is dropped
+DEFAULT_DEADMAN_TIMEOUT = 1000  # ms without joystick vectors before the robot is stopped
+# The card repeats a held vector every 300 ms, give the repeats room for a
+# late timer and a slow network before stopping a robot that is being driven
+MIN_DEADMAN_TIMEOUT = 1000
+DEFAULT_RECORDING_SIZE = 256  # MiB of camera recordings kept on disk per robot
+DEFAULT_METRICS_SAMPLE_RATE = 0  # percent of proxy requests timed, 0 disables timing
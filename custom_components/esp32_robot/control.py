@@ -0,0 +1,325 @@
+"""Outbound command scheduling for ESP32 Robot."""
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from .const import (
+    DEFAULT_CONTROL_RATE,
+    DEFAULT_DEADMAN_TIMEOUT,
+    DEFAULT_MOTION_DEADLINE,
+)
+from .metrics import path_group
+
+_LOGGER = logging.getLogger(__name__)
+
+OUTCOME_SENT = "sent"
+OUTCOME_SUPERSEDED = "superseded"
+OUTCOME_EXPIRED = "expired"
+OUTCOME_FAILED = "failed"
+
+STOP_VECTOR = {"mode": "joystick", "x": 0, "y": 0}
+
+# Seconds a settings write may take, so a slow robot does not hold the
+# sender, and the control lanes behind it, for the session's read timeout
+SETTINGS_TIMEOUT = 5
+
+
+class CommandResult:
+    """What happened to a scheduled command."""
+
+    def __init__(self, outcome, status=None, body=b"", content_type=None):
+        """Initialize the result."""
+        self.outcome = outcome
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+
+
+class ControlCommand:
+    """A request to the robot waiting in the scheduler."""
+
+    def __init__(
+        self, hass, method, path, params=None, payload=None, deadline=None, started=None
+    ):
+        """Initialize the command."""
+        self.method = method
+        self.path = path
+        self.params = params
+        self.payload = payload
+        self.deadline = deadline
+        # Sampled submit time, the command is timed until the robot answered
+        self.started = started
+        self.future = hass.loop.create_future()
+
+    def resolve(self, result):
+        """Hand the result to whoever waits for it, if anyone still does."""
+        if not self.future.done():
+            self.future.set_result(result)
+
+
+class ESP32RobotCommandScheduler:
+    """Per-robot outbound command queue with priority lanes.
+
+    Stops (zero vectors) are sent right away in their own request, so they
+    never wait behind a slow settings write. A motion vector already in
+    flight may still reach the robot after such a stop, so the stop is sent
+    again once that request finished. Other commands are sent one at a time,
+    highest lane first:
+
+    1. motion: the latest joystick vector; a newer vector replaces one not
+       yet sent, and a vector still waiting after its deadline is dropped
+    2. settings: one pending write per key (e.g. quality, led), a newer write
+       to the same key replaces the pending one, each limited to
+       SETTINGS_TIMEOUT
+
+    A dead-man timer queues a stop when no motion command arrived for
+    `deadman_timeout` seconds, so a client that went silent mid-drive does
+    not leave the robot moving.
+
+    With metrics, sampled commands are timed from submission to the robot's
+    response, whichever client submitted them, and failed sends are counted.
+    """
+
+    def __init__(
+        self,
+        hass,
+        sessions,
+        rate=DEFAULT_CONTROL_RATE,
+        motion_deadline=DEFAULT_MOTION_DEADLINE / 1000,
+        deadman_timeout=DEFAULT_DEADMAN_TIMEOUT / 1000,
+        metrics=None,
+    ):
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._sessions = sessions
+        self._metrics = metrics
+        self._interval = 1 / rate
+        # Never shorter than the control interval, a held vector would always expire
+        self._motion_deadline = max(motion_deadline, self._interval)
+        self._deadman_timeout = deadman_timeout
+        self._stop_tasks = set()
+        self._motion = None
+        self._motion_in_flight = False
+        self._resend_stop = None
+        self._settings = {}
+        self._last_motion_sent = 0.0
+        self._deadman_handle = None
+        self._wake = asyncio.Event()
+        self._task = None
+        self.commands_sent = 0
+        self.commands_superseded = 0
+        self.commands_expired = 0
+        self.commands_failed = 0
+        self.deadman_stops = 0
+
+    @property
+    def queue_depth(self):
+        """Return the number of commands waiting to be sent."""
+        return (self._motion is not None) + len(self._settings)
+
+    @property
+    def metrics(self):
+        """Return the scheduler counters."""
+        return {
+            "queue_depth": self.queue_depth,
+            "sent": self.commands_sent,
+            "superseded": self.commands_superseded,
+            "expired": self.commands_expired,
+            "failed": self.commands_failed,
+            "deadman_stops": self.deadman_stops,
+        }
+
+    def submit_control(self, payload):
+        """Queue a /control payload and return a future with its CommandResult."""
+        if payload.get("x") == 0 and payload.get("y") == 0:
+            return self._submit_stop(payload)
+
+        command = ControlCommand(
+            self.hass, "POST", "control",
+            payload=payload,
+            deadline=time.monotonic() + self._motion_deadline,
+            started=self._start(),
+        )
+        if self._motion is not None:
+            self._supersede(self._motion)
+        self._motion = command
+        # Sent after the vector in flight, no need to repeat an earlier stop
+        self._resend_stop = None
+        self._arm_deadman()
+        self._async_wake()
+        return command.future
+
+    def submit_setting(self, key, path, params):
+        """Queue a settings request and return a future with its CommandResult."""
+        command = ControlCommand(self.hass, "GET", path, params=params, started=self._start())
+        previous = self._settings.pop(key, None)
+        if previous is not None:
+            self._supersede(previous)
+        self._settings[key] = command
+        self._async_wake()
+        return command.future
+
+    def _submit_stop(self, payload):
+        """Send a stop now, discarding any motion that has not been sent yet."""
+        self._cancel_deadman()
+        if self._motion is not None:
+            self._supersede(self._motion)
+            self._motion = None
+        if self._motion_in_flight:
+            self._resend_stop = payload
+        command = ControlCommand(
+            self.hass, "POST", "control", payload=payload, started=self._start()
+        )
+        self._last_motion_sent = time.monotonic()
+        task = self.hass.async_create_background_task(
+            self._async_send(command), f"esp32_robot stop {self._sessions.ip_address}"
+        )
+        self._stop_tasks.add(task)
+        task.add_done_callback(self._stop_tasks.discard)
+        return command.future
+
+    def _start(self):
+        """Return a start time if this command is sampled, otherwise None."""
+        return self._metrics.start() if self._metrics is not None else None
+
+    def _supersede(self, command):
+        """Resolve a command that was replaced before it was sent."""
+        self.commands_superseded += 1
+        command.resolve(CommandResult(OUTCOME_SUPERSEDED))
+
+    def _arm_deadman(self):
+        """Restart the dead-man timer."""
+        self._cancel_deadman()
+        self._deadman_handle = self.hass.loop.call_later(
+            self._deadman_timeout, self._deadman_expired
+        )
+
+    def _cancel_deadman(self):
+        """Stop the dead-man timer."""
+        if self._deadman_handle is not None:
+            self._deadman_handle.cancel()
+            self._deadman_handle = None
+
+    def _deadman_expired(self):
+        """Stop the robot because the client stopped sending motion commands."""
+        self._deadman_handle = None
+        self.deadman_stops += 1
+        _LOGGER.warning(
+            "No control command for %s seconds, stopping robot %s",
+            self._deadman_timeout, self._sessions.ip_address,
+        )
+        self._submit_stop(STOP_VECTOR)
+
+    def _async_wake(self):
+        """Make sure the sender runs and re-evaluates the lanes."""
+        self._wake.set()
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), f"esp32_robot commands {self._sessions.ip_address}"
+            )
+
+    async def async_stop(self):
+        """Stop sending and drop all pending commands."""
+        self._cancel_deadman()
+        for command in (self._motion, *self._settings.values()):
+            if command is not None:
+                command.resolve(CommandResult(OUTCOME_FAILED))
+        self._motion = None
+        self._resend_stop = None
+        self._settings.clear()
+        sender, self._task = self._task, None
+        # Commands being sent are resolved as failed when their task is cancelled
+        for task in (sender, *self._stop_tasks):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _async_run(self):
+        """Send pending commands in priority order until all lanes are empty."""
+        try:
+            while True:
+                self._wake.clear()
+
+                delay = 0
+                if self._motion is not None:
+                    if time.monotonic() > self._motion.deadline:
+                        command, self._motion = self._motion, None
+                        self.commands_expired += 1
+                        command.resolve(CommandResult(OUTCOME_EXPIRED))
+                        continue
+                    delay = self._last_motion_sent + self._interval - time.monotonic()
+                    if delay <= 0:
+                        command, self._motion = self._motion, None
+                        self._last_motion_sent = time.monotonic()
+                        self._motion_in_flight = True
+                        try:
+                            await self._async_send(command)
+                        finally:
+                            self._motion_in_flight = False
+                        if self._resend_stop is not None:
+                            # A stop sent meanwhile may have reached the robot first
+                            payload, self._resend_stop = self._resend_stop, None
+                            await self._async_send(
+                                ControlCommand(self.hass, "POST", "control", payload=payload)
+                            )
+                        continue
+
+                if self._settings:
+                    # Settings use the gap while motion waits for the control rate
+                    key = next(iter(self._settings))
+                    await self._async_send(
+                        self._settings.pop(key),
+                        aiohttp.ClientTimeout(total=SETTINGS_TIMEOUT),
+                    )
+                    continue
+
+                if self._motion is None:
+                    break
+
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._task is asyncio.current_task():
+                self._task = None
+
+    async def _async_send(self, command, timeout=None):
+        """Send one command to the robot and resolve it with the response."""
+        url = f"http://{self._sessions.ip_address}/{command.path}"
+        kwargs = {} if timeout is None else {"timeout": timeout}
+        try:
+            async with self._sessions.control.request(
+                command.method, url, params=command.params, json=command.payload, **kwargs
+            ) as response:
+                body = await response.read()
+                if self._metrics is not None:
+                    self._metrics.observe(
+                        self._metrics.latency[path_group(command.path)], command.started
+                    )
+                if response.status != 200:
+                    _LOGGER.warning("Command %s rejected by robot: HTTP %s", url, response.status)
+                self.commands_sent += 1
+                command.resolve(
+                    CommandResult(
+                        OUTCOME_SENT,
+                        response.status,
+                        body,
+                        response.headers.get("Content-Type"),
+                    )
+                )
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.warning("Error sending command %s: %s", url, err)
+            if self._metrics is not None:
+                self._metrics.count_error(err)
+            self.commands_failed += 1
+            command.resolve(CommandResult(OUTCOME_FAILED))
+        except asyncio.CancelledError:
+            # Unloading, do not leave the request that submitted it waiting
+            command.resolve(CommandResult(OUTCOME_FAILED))
+            raise
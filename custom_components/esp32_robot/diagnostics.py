@@ -0,0 +1,49 @@
+"""Diagnostics support for ESP32 Robot."""
+from homeassistant.components.diagnostics import async_redact_data
+
+from .const import CONF_IP_ADDRESS, DOMAIN
+
+TO_REDACT = {CONF_IP_ADDRESS}
+
+
+async def async_get_config_entry_diagnostics(hass, entry):
+    """Return the proxy, stream, command and polling metrics of a robot."""
+    robot = hass.data[DOMAIN][entry.entry_id]
+    hub = robot["stream_hub"]
+    diagnostics = {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "proxy": robot["metrics"].as_dict(),
+        "stream": {
+            "viewers": hub.viewer_count,
+            "tiers": hub.tiers,
+            "frames_received": hub.frames_received,
+        },
+        "commands": robot["commands"].metrics,
+    }
+
+    coordinator = robot.get("coordinator")
+    if coordinator is not None:
+        diagnostics["coordinator"] = {
+            "poll_mode": coordinator.poll_mode,
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "last_update_success": coordinator.last_update_success,
+            "last_error": coordinator.last_error,
+            "data": coordinator.data,
+            "telemetry_samples": len(coordinator.telemetry),
+        }
+
+    if robot["recorder"] is not None:
+        diagnostics["recorder"] = robot["recorder"].info
+
+    fleet = hass.data[DOMAIN].get("fleet")
+    if fleet is not None:
+        diagnostics["fleet"] = {
+            "cycles": fleet.cycles,
+            "last_cycle_size": fleet.last_cycle_size,
+            "last_cycle_duration": fleet.last_cycle_duration,
+        }
+
+    return diagnostics
@@ -0,0 +1,134 @@
+"""Shared status poller for a fleet of ESP32 Robots."""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+import async_timeout
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import DEFAULT_FLEET_CONCURRENCY, DEFAULT_FLEET_DEADLINE
+
+_LOGGER = logging.getLogger(__name__)
+
+# How often the poller checks which robots are due
+FLEET_TICK = timedelta(seconds=1)
+
+# Offset between the first polls of consecutive robots
+FLEET_STAGGER = 0.5  # seconds
+
+
+class ESP32RobotFleetPoller:
+    """Poll the status of all robots from a single timer.
+
+    Every tick the robots whose coordinator interval has elapsed are
+    refreshed concurrently, at most `concurrency` at a time, each bounded by
+    `deadline` seconds. Each poll runs as its own task, so a slow robot only
+    delays its own next poll, not the other robots'. Coordinators keep
+    deciding their own interval, the poller only decides when and how many
+    requests run.
+    """
+
+    def __init__(self, hass, concurrency=DEFAULT_FLEET_CONCURRENCY, deadline=DEFAULT_FLEET_DEADLINE):
+        """Initialize the poller."""
+        self.hass = hass
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._deadline = deadline
+        self._coordinators = {}
+        self._unsub_timer = None
+        self._polls = {}
+        self.cycles = 0
+        self.last_cycle_size = 0
+        self.last_cycle_duration = None
+
+    @callback
+    def async_add(self, coordinator):
+        """Start polling a coordinator and return a callback removing it."""
+        coordinator.fleet_managed = True
+        # Spread first polls so robots set up together do not fire together
+        offset = len(self._coordinators) * FLEET_STAGGER
+        offset %= max(coordinator.update_interval.total_seconds(), FLEET_STAGGER)
+        self._coordinators[coordinator] = time.monotonic() + offset
+
+        if self._unsub_timer is None:
+            self._unsub_timer = async_track_time_interval(
+                self.hass, self._async_tick, FLEET_TICK, name="esp32_robot fleet poller"
+            )
+
+        @callback
+        def _async_remove():
+            self._coordinators.pop(coordinator, None)
+            poll = self._polls.pop(coordinator, None)
+            if poll is not None:
+                poll.cancel()
+            coordinator.fleet_managed = False
+            if not self._coordinators and self._unsub_timer is not None:
+                self._unsub_timer()
+                self._unsub_timer = None
+
+        return _async_remove
+
+    def _due(self, coordinator, first_due):
+        """Return the monotonic time the coordinator should be polled next."""
+        if coordinator.last_poll_time is None:
+            return first_due
+        return coordinator.last_poll_time + coordinator.update_interval.total_seconds()
+
+    @callback
+    def _async_tick(self, now):
+        """Start a poll for every robot that is due and not still being polled."""
+        monotonic = time.monotonic()
+        due = [
+            coordinator
+            for coordinator, first_due in self._coordinators.items()
+            if coordinator not in self._polls
+            and self._due(coordinator, first_due) <= monotonic
+        ]
+        if not due:
+            return
+
+        polls = []
+        for coordinator in due:
+            poll = self.hass.async_create_background_task(
+                self._async_poll(coordinator), "esp32_robot fleet poll"
+            )
+            self._polls[coordinator] = poll
+            poll.add_done_callback(
+                lambda poll, coordinator=coordinator: self._poll_done(coordinator, poll)
+            )
+            polls.append(poll)
+
+        # Timed on the side, the next tick does not wait for this cycle
+        self.hass.async_create_background_task(
+            self._async_time_cycle(polls, monotonic), "esp32_robot fleet cycle"
+        )
+
+    @callback
+    def _poll_done(self, coordinator, poll):
+        """Forget a finished poll, unless a newer one replaced it."""
+        if self._polls.get(coordinator) is poll:
+            del self._polls[coordinator]
+
+    async def _async_time_cycle(self, polls, started):
+        """Record the size and duration of the polls started by one tick."""
+        await asyncio.wait(polls)
+        self.cycles += 1
+        self.last_cycle_size = len(polls)
+        self.last_cycle_duration = time.monotonic() - started
+        _LOGGER.debug(
+            "Fleet poll cycle: %d of %d robots in %.3fs",
+            len(polls), len(self._coordinators), self.last_cycle_duration,
+        )
+
+    async def _async_poll(self, coordinator):
+        """Refresh one coordinator within the per-robot deadline."""
+        async with self._semaphore:
+            try:
+                async with async_timeout.timeout(self._deadline):
+                    await coordinator.async_refresh()
+            except asyncio.TimeoutError:
+                coordinator.async_set_unreachable(
+                    f"No status within {self._deadline} seconds"
+                )
@@ -1,31 +1,173 @@
 """Register the ESP32 Robot frontend elements."""
+import gzip
+import hashlib
+import json
 import logging
 from pathlib import Path
-from homeassistant.components.http import StaticPathConfig
+
+from aiohttp import hdrs, web
 from homeassistant.components.frontend import add_extra_js_url
+from homeassistant.components.http import HomeAssistantView
+
+try:
+    import brotli
+except ImportError:  # Only gzip variants are served
+    brotli = None
 
 _LOGGER = logging.getLogger(__name__)
 
 DOMAIN = "esp32_robot"
-LOVELACE_CARD_URL = f"/{DOMAIN}/esp32-robot-card.js"
-EDITOR_URL = f"/{DOMAIN}/editor.js"
+FRONTEND_URL = f"/{DOMAIN}/frontend"
+LOVELACE_PATH = Path(__file__).parent / "lovelace"
+
+# Files of the card bundle. Only the card is loaded with the frontend, it
+# imports the editor when the card editor opens.
+CARD_FILE = "esp32-robot-card.js"
+BUNDLE_FILES = (CARD_FILE, "editor.js")
+
+# Precompressed variants in order of preference, with their file suffix
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+# Bundle URLs change with their content, so clients may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CACHE_MANIFEST = "bundle.json"
+
+
+def _encodings():
+    """Return the encodings the bundle can be precompressed with here."""
+    return [encoding for encoding in ENCODINGS if encoding != "br" or brotli is not None]
+
+
+def _compress(content, encoding):
+    """Return content compressed with an encoding."""
+    if encoding == "br":
+        return brotli.compress(content)
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def accepts_encoding(header, encoding):
+    """Return True if an Accept-Encoding header allows a content coding.
+
+    A coding listed, or covered by "*", with q=0 is refused.
+    """
+    qualities = {}
+    for token in header.split(","):
+        coding, *params = (part.strip() for part in token.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            qualities[coding.lower()] = quality
+    return qualities.get(encoding, qualities.get("*", 0)) > 0
+
+
+def build_bundle(cache_dir):
+    """Return the bundle version and each file's content and compressed variants.
+
+    The version hashes the content of all bundle files. It is cached in
+    cache_dir with the compressed variants, against the files' mtime and
+    size, so they are only computed again after the files changed. Runs in
+    the executor.
+    """
+    cache_dir = Path(cache_dir)
+    stamps = {}
+    for name in BUNDLE_FILES:
+        stat = (LOVELACE_PATH / name).stat()
+        stamps[name] = [stat.st_mtime_ns, stat.st_size]
+    encodings = _encodings()
+    files = {name: {"identity": (LOVELACE_PATH / name).read_bytes()} for name in BUNDLE_FILES}
+
+    try:
+        manifest = json.loads((cache_dir / CACHE_MANIFEST).read_text())
+        if manifest["files"] == stamps and set(encodings) <= set(manifest["encodings"]):
+            for name, variants in files.items():
+                for encoding in encodings:
+                    variants[encoding] = (cache_dir / f"{name}{ENCODINGS[encoding]}").read_bytes()
+            return manifest["version"], files
+    except (OSError, ValueError, KeyError):
+        pass
+
+    digest = hashlib.sha256()
+    for name, variants in files.items():
+        digest.update(name.encode())
+        digest.update(variants["identity"])
+        for encoding in encodings:
+            variants[encoding] = _compress(variants["identity"], encoding)
+    version = digest.hexdigest()[:16]
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        for name, variants in files.items():
+            for encoding in encodings:
+                (cache_dir / f"{name}{ENCODINGS[encoding]}").write_bytes(variants[encoding])
+        (cache_dir / CACHE_MANIFEST).write_text(
+            json.dumps({"version": version, "files": stamps, "encodings": encodings})
+        )
+    except OSError as err:
+        _LOGGER.debug("Could not cache the card bundle in %s: %s", cache_dir, err)
+    return version, files
+
+
+class ESP32RobotFrontendView(HomeAssistantView):
+    """Serve the card bundle under content-hashed URLs."""
+
+    url = FRONTEND_URL + "/{version}/{filename}"
+    name = "esp32_robot:frontend"
+    requires_auth = False
+
+    def __init__(self, version, files):
+        """Initialize the view with the built bundle."""
+        self._version = version
+        self._files = files
+
+    async def get(self, request, version, filename):
+        """Serve a bundle file, precompressed if the client accepts it."""
+        variants = self._files.get(filename)
+        if variants is None:
+            return web.Response(status=404)
+
+        headers = {hdrs.VARY: hdrs.ACCEPT_ENCODING}
+        if version == self._version:
+            headers[hdrs.CACHE_CONTROL] = IMMUTABLE_CACHE_CONTROL
+        else:
+            # A page loaded before an upgrade, serve the current file uncached
+            headers[hdrs.CACHE_CONTROL] = "no-cache"
+
+        accept_encoding = request.headers.get(hdrs.ACCEPT_ENCODING, "")
+        encoding = next(
+            (
+                encoding
+                for encoding in ENCODINGS
+                if encoding in variants and accepts_encoding(accept_encoding, encoding)
+            ),
+            None,
+        )
+        if encoding is not None:
+            headers[hdrs.CONTENT_ENCODING] = encoding
+        return web.Response(
+            body=variants[encoding or "identity"],
+            content_type="application/javascript",
+            charset="utf-8",
+            headers=headers,
+        )
+
 
 async def async_setup_frontend(hass):
     """Set up the ESP32 Robot frontend elements."""
-    # Add scripts to frontend
-    add_extra_js_url(hass, LOVELACE_CARD_URL)
-    add_extra_js_url(hass, EDITOR_URL)
-    
-    # Get file paths
-    card_path = str(Path(__file__).parent / "lovelace/esp32-robot-card.js")
-    editor_path = str(Path(__file__).parent / "lovelace/editor.js")
-    
-    # Register static paths
-    await hass.http.async_register_static_paths([
-        StaticPathConfig(LOVELACE_CARD_URL, card_path, True),
-        StaticPathConfig(EDITOR_URL, editor_path, True)
-    ])
-    
-    _LOGGER.info("ESP32 Robot card registered successfully")
-    
-    return True 
\ No newline at end of file
+    version, files = await hass.async_add_executor_job(
+        build_bundle, hass.config.path(DOMAIN, "frontend")
+    )
+
+    # Registered once for all robots, the editor is loaded by the card on demand
+    hass.http.register_view(ESP32RobotFrontendView(version, files))
+    add_extra_js_url(hass, f"{FRONTEND_URL}/{version}/{CARD_FILE}")
+
+    _LOGGER.info("ESP32 Robot card registered successfully, bundle version %s", version)
+
+    return True
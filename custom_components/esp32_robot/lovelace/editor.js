@@ -47,7 +47,7 @@ class ESP32RobotCardEditor extends LitElement {
     if (!this._config || !this.hass) return;
     
     const target = event.target;
-    const value = target.value;
+    const value = target.checked !== undefined ? target.checked : target.value;
     const configValue = target.configValue;
     
     if (!configValue) return;
@@ -55,8 +55,8 @@ class ESP32RobotCardEditor extends LitElement {
     // Создаем копию объекта конфигурации
     const newConfig = { ...this._config };
     
-    if (value === '') {
-      // Если значение пустое, удаляем свойство из копии объекта
+    if (value === '' || value === false) {
+      // Если значение пустое или выключено, удаляем свойство из копии объекта
       if (configValue in newConfig) {
         delete newConfig[configValue];
       }
@@ -109,6 +109,16 @@ class ESP32RobotCardEditor extends LitElement {
             `)}
           </ha-select>
         </div>
+
+        <div class="field">
+          <ha-formfield label="Превью камеры в карточке">
+            <ha-switch
+              .checked=${this._config.preview === true}
+              .configValue=${"preview"}
+              @change="${this._valueChanged}"
+            ></ha-switch>
+          </ha-formfield>
+        </div>
       </div>
     `;
   }
@@ -24,6 +24,428 @@ popupStyles.textContent = `
 `;
 document.head.appendChild(popupStyles);
 
+// Low frame rate and resolution tier of the proxied stream used for the
+// card's preview, the control dialog uses the full stream
+const PREVIEW_STREAM_QUERY = '?fps=2&scale=0.25';
+
+// Delay before a failed preview is requested again
+const PREVIEW_RETRY_DELAY = 10000;
+
+// Status and streams of a robot are shared through a per-entity store: all
+// cards in the page share one status subscription and one connection per
+// stream tier, tabs agree over a BroadcastChannel on a single tab holding
+// each stream and forwarding its frames, and everything pauses while the
+// page is hidden.
+
+// Signed URLs are reused until this many seconds before they expire
+const SIGNED_URL_MARGIN = 30;
+
+// Subscriptions and streams are kept this long after their last listener
+// left, so reopening the dialog does not reconnect
+const STORE_LINGER = 10000;
+
+// The tab holding a stream announces itself this often, and is replaced
+// when it has not been heard of for STREAM_HOLDER_TIMEOUT
+const STREAM_HEARTBEAT_INTERVAL = 1000;
+const STREAM_HOLDER_TIMEOUT = 3000;
+
+// A tab that wants a stream waits this long for a holder to answer before
+// opening the stream itself
+const STREAM_CLAIM_DELAY = 250;
+
+const TAB_ID = `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+
+const HEADER_END = new Uint8Array([13, 10, 13, 10]);
+
+function indexOfBytes(buffer, pattern, from = 0) {
+  for (let i = from; i <= buffer.length - pattern.length; i++) {
+    let j = 0;
+    while (j < pattern.length && buffer[i + j] === pattern[j]) {
+      j++;
+    }
+    if (j === pattern.length) {
+      return i;
+    }
+  }
+  return -1;
+}
+
+// Split a multipart MJPEG body into JPEG frames using each part's Content-Length
+async function readMultipartFrames(body, onFrame) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = new Uint8Array(0);
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) {
+      return;
+    }
+    const joined = new Uint8Array(buffer.length + value.length);
+    joined.set(buffer);
+    joined.set(value, buffer.length);
+    buffer = joined;
+
+    for (;;) {
+      const headerEnd = indexOfBytes(buffer, HEADER_END);
+      if (headerEnd < 0) {
+        break;
+      }
+      const match = /content-length:\s*(\d+)/i.exec(decoder.decode(buffer.subarray(0, headerEnd)));
+      if (!match) {
+        throw new Error('Stream part without Content-Length');
+      }
+      const start = headerEnd + HEADER_END.length;
+      const end = start + parseInt(match[1], 10);
+      if (buffer.length < end) {
+        break;
+      }
+      onFrame(buffer.slice(start, end));
+      buffer = buffer.slice(end);
+    }
+  }
+}
+
+class ESP32RobotSharedStream {
+  constructor(store, query) {
+    this.store = store;
+    this.query = query;
+    this.listeners = new Set();
+    this.frameUrl = null;
+    this._previousUrl = null;
+    this._lastFrame = null;
+    this._lingerUntil = 0;
+    this._holding = false;
+    this._abort = null;
+    this._holderId = null;
+    this._holderSeenAt = 0;
+    this._claimAt = 0;
+    this._wantedBy = new Map();
+    this._timer = null;
+    this._channel = typeof BroadcastChannel === 'undefined'
+      ? null
+      : new BroadcastChannel(`esp32-robot-stream-${store.entityId}${query}`);
+    if (this._channel) {
+      this._channel.onmessage = (event) => this._onMessage(event.data);
+    }
+  }
+
+  subscribe(listener) {
+    this.listeners.add(listener);
+    if (!this.frameUrl && this._lastFrame) {
+      this._deliver(this._lastFrame);
+    } else if (this.frameUrl) {
+      listener(this.frameUrl);
+    }
+    this.sync();
+    return () => {
+      if (!this.listeners.delete(listener)) {
+        return;
+      }
+      if (!this.listeners.size) {
+        this._lingerUntil = Date.now() + STORE_LINGER;
+        this._releaseFrames();
+      }
+      this.sync();
+    };
+  }
+
+  // True if this tab wants the stream's frames
+  get wanted() {
+    return !document.hidden && (this.listeners.size > 0 || Date.now() < this._lingerUntil);
+  }
+
+  // Start or stop the stream and the heartbeat to match what is wanted
+  sync() {
+    if (!this.wanted && !this._holding) {
+      clearInterval(this._timer);
+      this._timer = null;
+      this._lastFrame = null;
+      return;
+    }
+    if (!this._timer) {
+      this._timer = setInterval(() => this.sync(), STREAM_HEARTBEAT_INTERVAL);
+      if (!this._holding) {
+        // Give a holding tab the chance to answer before opening the stream
+        this._claimAt = Date.now() + STREAM_CLAIM_DELAY;
+        setTimeout(() => this.sync(), STREAM_CLAIM_DELAY);
+      }
+    }
+
+    const now = Date.now();
+    for (const [tab, seenAt] of this._wantedBy) {
+      if (now - seenAt > STREAM_HOLDER_TIMEOUT) {
+        this._wantedBy.delete(tab);
+      }
+    }
+
+    if (this._holding) {
+      if (document.hidden || (!this.wanted && !this._wantedBy.size)) {
+        this._release('release');
+      } else {
+        this._post({ type: 'holder' });
+      }
+    } else if (this.wanted) {
+      const holderAlive = this._holderId && now - this._holderSeenAt < STREAM_HOLDER_TIMEOUT;
+      if (holderAlive || now < this._claimAt) {
+        this._post({ type: 'want' });
+      } else {
+        this._hold();
+      }
+    }
+  }
+
+  _post(message) {
+    if (this._channel) {
+      this._channel.postMessage({ ...message, tab: TAB_ID });
+    }
+  }
+
+  _onMessage(message) {
+    const now = Date.now();
+    switch (message.type) {
+      case 'want':
+        this._wantedBy.set(message.tab, now);
+        if (this._holding) {
+          this._post({ type: 'holder' });
+          if (this._lastFrame) {
+            this._post({ type: 'frame', frame: this._lastFrame });
+          }
+        }
+        break;
+      case 'holder':
+      case 'frame':
+        if (this._holding) {
+          if (message.tab > TAB_ID) {
+            // Both tabs opened the stream, the one with the larger id keeps it
+            this._release(null);
+          } else {
+            break;
+          }
+        }
+        this._holderId = message.tab;
+        this._holderSeenAt = now;
+        if (message.type === 'frame' && this.wanted) {
+          this._deliver(message.frame);
+        }
+        break;
+      case 'release':
+        if (message.tab === this._holderId) {
+          this._holderId = null;
+          this.sync();
+        }
+        break;
+      case 'end':
+        if (message.tab === this._holderId) {
+          this._holderId = null;
+          this._ended();
+        }
+        break;
+    }
+  }
+
+  async _hold() {
+    const abort = new AbortController();
+    this._holding = true;
+    this._abort = abort;
+    this._holderId = TAB_ID;
+    this._post({ type: 'holder' });
+
+    try {
+      const signedUrl = await this.store.signPath(
+        `/api/esp32_robot/proxy/${this.store.entityId}/stream${this.query}`
+      );
+      const response = await fetch(this.store.hass.hassUrl(signedUrl), {
+        cache: 'no-store',
+        signal: abort.signal,
+      });
+      if (!response.ok) {
+        throw new Error(`Stream request failed with status ${response.status}`);
+      }
+      await readMultipartFrames(response.body, (frame) => this._onFrame(frame));
+    } catch (error) {
+      if (!abort.signal.aborted) {
+        console.error('Stream error:', error);
+      }
+    }
+
+    if (this._abort === abort) {
+      // The stream ended by itself, not through _release
+      this._release('end');
+      this._ended();
+    }
+  }
+
+  _onFrame(frame) {
+    if (this._wantedBy.size) {
+      this._post({ type: 'frame', frame });
+    }
+    this._deliver(frame);
+  }
+
+  // Close the stream this tab holds and tell the other tabs why
+  _release(reason) {
+    if (this._abort) {
+      this._abort.abort();
+      this._abort = null;
+    }
+    this._holding = false;
+    this._holderId = null;
+    if (reason) {
+      this._post({ type: reason });
+    }
+  }
+
+  _deliver(frame) {
+    this._lastFrame = frame;
+    if (!this.listeners.size) {
+      return;
+    }
+    // The previous frame may still be decoding, revoke the one before it
+    if (this._previousUrl) {
+      URL.revokeObjectURL(this._previousUrl);
+    }
+    this._previousUrl = this.frameUrl;
+    this.frameUrl = URL.createObjectURL(new Blob([frame], { type: 'image/jpeg' }));
+    this.listeners.forEach((listener) => listener(this.frameUrl));
+  }
+
+  _releaseFrames() {
+    [this._previousUrl, this.frameUrl].forEach((url) => url && URL.revokeObjectURL(url));
+    this._previousUrl = null;
+    this.frameUrl = null;
+  }
+
+  // The stream was closed upstream: tell the listeners, who decide whether to retry
+  _ended() {
+    this._lastFrame = null;
+    this._lingerUntil = 0;
+    this.listeners.forEach((listener) => listener(null));
+    this.sync();
+  }
+}
+
+class ESP32RobotStore {
+  static get(hass, entityId) {
+    let store = ESP32RobotStore._stores.get(entityId);
+    if (!store) {
+      store = new ESP32RobotStore(entityId);
+      ESP32RobotStore._stores.set(entityId, store);
+    }
+    store.hass = hass;
+    return store;
+  }
+
+  // Pause or resume every store when the page is hidden or shown, and hand
+  // over held streams when the tab goes away
+  static _sync(unloading = false) {
+    ESP32RobotStore._stores.forEach((store) => {
+      store._syncStatus();
+      store._streams.forEach((stream) => unloading ? stream._release('release') : stream.sync());
+    });
+  }
+
+  constructor(entityId) {
+    this.entityId = entityId;
+    this.hass = null;
+    this.status = {};
+    this._statusListeners = new Set();
+    this._statusSubscription = null;
+    this._statusLingerUntil = 0;
+    this._signedUrls = new Map();
+    this._streams = new Map();
+  }
+
+  // listener(status) gets the merged status pushed by the integration, or
+  // (null, error) if the subscription failed
+  subscribeStatus(listener) {
+    this._statusListeners.add(listener);
+    if (Object.keys(this.status).length) {
+      listener(this.status);
+    }
+    this._syncStatus();
+    return () => {
+      if (this._statusListeners.delete(listener) && !this._statusListeners.size) {
+        this._statusLingerUntil = Date.now() + STORE_LINGER;
+        setTimeout(() => this._syncStatus(), STORE_LINGER);
+      }
+    };
+  }
+
+  _syncStatus() {
+    const wanted = !document.hidden
+      && (this._statusListeners.size > 0 || Date.now() < this._statusLingerUntil);
+    if (wanted && !this._statusSubscription) {
+      // The first event holds the whole status, keys gone while paused must not stay
+      this.status = {};
+      const subscription = this.hass.connection.subscribeMessage(
+        (event) => {
+          Object.assign(this.status, event.status);
+          this._statusListeners.forEach((listener) => listener(this.status));
+        },
+        {
+          type: 'esp32_robot/subscribe_status',
+          entity_id: `sensor.${this.entityId}`,
+        }
+      );
+      this._statusSubscription = subscription;
+      subscription.catch((error) => {
+        if (this._statusSubscription === subscription) {
+          this._statusSubscription = null;
+          this._statusListeners.forEach((listener) => listener(null, error));
+        }
+      });
+    } else if (!wanted && this._statusSubscription) {
+      this._statusSubscription.then((unsubscribe) => unsubscribe()).catch(() => {});
+      this._statusSubscription = null;
+    }
+  }
+
+  // listener(frameUrl) gets an object URL per frame of the stream tier
+  // selected by query, or null when the stream ended
+  subscribeStream(query, listener) {
+    let stream = this._streams.get(query);
+    if (!stream) {
+      stream = new ESP32RobotSharedStream(this, query);
+      this._streams.set(query, stream);
+    }
+    return stream.subscribe(listener);
+  }
+
+  // Return a signed path, reusing it until shortly before it expires
+  signPath(path, expires = 300) {
+    const cached = this._signedUrls.get(path);
+    if (cached && Date.now() < cached.validUntil) {
+      return cached.promise;
+    }
+
+    const promise = this.hass.connection.sendMessagePromise({
+      type: 'auth/sign_path',
+      path,
+      expires,
+    }).then((result) => {
+      // The signed path with ?authSig=... is in the path property
+      const signedPath = result?.path || result?.result?.path;
+      if (!signedPath) {
+        throw new Error('Failed to get signed path');
+      }
+      return signedPath;
+    });
+    const entry = { promise, validUntil: Date.now() + (expires - SIGNED_URL_MARGIN) * 1000 };
+    this._signedUrls.set(path, entry);
+    promise.catch(() => {
+      if (this._signedUrls.get(path) === entry) {
+        this._signedUrls.delete(path);
+      }
+    });
+    return promise;
+  }
+}
+
+ESP32RobotStore._stores = new Map();
+document.addEventListener('visibilitychange', () => ESP32RobotStore._sync());
+window.addEventListener('pagehide', () => ESP32RobotStore._sync(true));
+window.addEventListener('pageshow', () => ESP32RobotStore._sync());
+
 class ESP32RobotCard extends LitElement {
   static get properties() {
     return {
@@ -35,6 +457,9 @@ class ESP32RobotCard extends LitElement {
   constructor() {
     super();
     this._config = {};
+    this._previewUrl = null;
+    this._previewUnsubscribe = null;
+    this._previewRetryAt = 0;
   }
 
   static get styles() {
@@ -161,6 +586,22 @@ class ESP32RobotCard extends LitElement {
         transform: translateY(1px);
       }
       
+      .preview {
+        margin-top: 12px;
+        background-color: #000;
+        border-radius: 4px;
+        overflow: hidden;
+        aspect-ratio: 4 / 3;
+        cursor: pointer;
+      }
+
+      .preview img {
+        display: block;
+        width: 100%;
+        height: 100%;
+        object-fit: contain;
+      }
+
       .error {
         color: var(--error-color);
         margin-top: 8px;
@@ -199,7 +640,9 @@ class ESP32RobotCard extends LitElement {
     this.requestUpdate();
   }
 
-  static getConfigElement() {
+  static async getConfigElement() {
+    // The editor is loaded only when the card editor opens, from the same bundle version
+    await import('./editor.js');
     return document.createElement("esp32-robot-card-editor");
   }
 
@@ -219,7 +662,58 @@ class ESP32RobotCard extends LitElement {
   }
 
   getCardSize() {
-    return 3;
+    return this._config.preview ? 6 : 3;
+  }
+
+  connectedCallback() {
+    super.connectedCallback();
+    this.requestUpdate();
+  }
+
+  disconnectedCallback() {
+    super.disconnectedCallback();
+    this._stopPreview();
+  }
+
+  updated() {
+    this._updatePreview();
+  }
+
+  _store(entityId) {
+    return ESP32RobotStore.get(this._hass, entityId);
+  }
+
+  // Follow the preview tier of the robot's shared stream while the preview is shown
+  _updatePreview() {
+    const wanted = this._config.preview && this._entity && this._entity.state === 'online'
+      && this.isConnected && Date.now() >= this._previewRetryAt;
+    if (!wanted) {
+      this._stopPreview();
+      return;
+    }
+    if (this._previewUnsubscribe) {
+      return;
+    }
+
+    const entityId = this._entity.entity_id.split(".")[1];
+    this._previewUnsubscribe = this._store(entityId).subscribeStream(PREVIEW_STREAM_QUERY, (frameUrl) => {
+      if (!frameUrl) {
+        // The stream ended or was refused, try again after a while
+        this._stopPreview();
+        this._previewRetryAt = Date.now() + PREVIEW_RETRY_DELAY;
+      } else {
+        this._previewUrl = frameUrl;
+      }
+      this.requestUpdate();
+    });
+  }
+
+  _stopPreview() {
+    if (this._previewUnsubscribe) {
+      this._previewUnsubscribe();
+      this._previewUnsubscribe = null;
+    }
+    this._previewUrl = null;
   }
 
   render() {
@@ -263,6 +757,14 @@ class ESP32RobotCard extends LitElement {
           </button>
         </div>
         
+        ${isOnline && this._config.preview ? html`
+          <div class="preview" @click="${this._openControlInterface}">
+            ${this._previewUrl ? html`
+              <img src="${this._previewUrl}" alt="">
+            ` : ''}
+          </div>
+        ` : ''}
+
         ${isOnline && this._entity.attributes.last_error ? html`
           <div class="error">
             ${this._entity.attributes.last_error}
@@ -811,23 +1313,22 @@ class ESP32RobotCard extends LitElement {
       videoImg.style.display = 'none';
       
       try {
-        // Get a signed URL using the simple promise-based API
-        const signedUrl = await this._getSignedStreamUrl(entityId);
-        console.log("Got signed URL for stream");
-        
-        // Set up the video stream with the signed URL
-        videoImg.src = this._hass.hassUrl(signedUrl);
-        
-        videoImg.onload = () => {
-          console.log("Stream loaded successfully");
-          loadingEl.style.display = 'none';
-          videoImg.style.display = 'block';
-          fpsStatus.style.display = 'block'; // Show FPS when stream starts
-        };
-        
-        videoImg.onerror = (error) => {
-          console.error("Stream error:", error);
+        // Frames come from the robot's shared stream, which other cards and
+        // tabs showing the same robot use as well
+        this._streamUnsubscribe = this._store(entityId).subscribeStream('', (frameUrl) => {
+          if (frameUrl) {
+            videoImg.src = frameUrl;
+            if (videoImg.style.display === 'none') {
+              console.log("Stream loaded successfully");
+              loadingEl.style.display = 'none';
+              videoImg.style.display = 'block';
+              fpsStatus.style.display = 'block'; // Show FPS when stream starts
+            }
+            return;
+          }
+          
           // Сбрасываем состояние стрима как при остановке
+          this._unsubscribeStream();
           this._isStreaming = false;
           streamButton.innerHTML = '<span style="font-size: 20px;">▶</span>';
           streamButton.classList.remove('active');
@@ -838,12 +1339,9 @@ class ESP32RobotCard extends LitElement {
           loadingEl.textContent = 'Click Start Stream button';
           loadingEl.style.display = 'block';
           
-          // Останавливаем опрос статуса
-          if (this._statusInterval) {
-            clearInterval(this._statusInterval);
-            this._statusInterval = null;
-          }
-        };
+          // Останавливаем обновление статуса
+          this._stopStatusUpdates();
+        });
         
         // Poll for status updates
         this._startStatusPolling(entityId, fpsStatus);
@@ -860,10 +1358,8 @@ class ESP32RobotCard extends LitElement {
     
     // Function to stop streaming
     this._stopStream = () => {
-      if (this._statusInterval) {
-        clearInterval(this._statusInterval);
-        this._statusInterval = null;
-      }
+      this._stopStatusUpdates();
+      this._unsubscribeStream();
       
       // Send request to stop the stream on the device
       this._hass.fetchWithAuth(`/api/esp32_robot/proxy/${entityId}/stopstream`, {
@@ -877,9 +1373,6 @@ class ESP32RobotCard extends LitElement {
       streamButton.innerHTML = '<span style="font-size: 20px;">▶</span>';
       streamButton.classList.remove('active');
       
-      // Очистить обработчики событий перед изменением src
-      videoImg.onload = null;
-      videoImg.onerror = null;
       // Сначала скрыть изображение, затем очистить источник
       videoImg.style.display = 'none';
       // Используем setTimeout, чтобы дать браузеру время на обработку изменений
@@ -905,55 +1398,115 @@ class ESP32RobotCard extends LitElement {
     loadingEl.textContent = 'Click Start Stream button';
   }
   
-  // Simple promise-based function to get a signed URL
-  async _getSignedStreamUrl(robotId, expires = 300) {  // Increased expiration to 5 minutes for safety
-    const path = `/api/esp32_robot/proxy/${robotId}/stream`;
+  _unsubscribeStream() {
+    if (this._streamUnsubscribe) {
+      this._streamUnsubscribe();
+      this._streamUnsubscribe = null;
+    }
+  }
+  
+  _startStatusPolling(entityId, fpsStatus) {
+    // Stop existing updates
+    this._stopStatusUpdates();
+    
+    // Function to show status
+    const showStatus = (data) => {
+      // Update FPS with one decimal place
+      if (data.fps !== undefined && data.fps !== null) {
+        fpsStatus.textContent = `FPS: ${data.fps.toFixed(1)}`;
+        fpsStatus.style.display = 'block';
+      } else {
+        fpsStatus.textContent = 'FPS: --';
+      }
+    };
     
-    try {
-      const result = await this._hass.connection.sendMessagePromise({
-        type: "auth/sign_path",
-        path,
-        expires,
-      });
-      
-      console.log("Signed URL response:", result);
-      
-      // Handle the response format correctly - the signed URL is directly in the path property
-      if (result?.path) {
-        return result.path;  // The signed path with ?authSig=...
-      } else if (result?.result?.path) {
-        return result.result.path;  // Alternative format just in case
+    // Status is pushed from the integration's coordinator, so an open dialog
+    // does not cause any extra requests to the robot. The subscription is
+    // shared with every other card of the robot in the page
+    this._statusUnsubscribe = this._store(entityId).subscribeStatus((status, error) => {
+      if (status) {
+        showStatus(status);
+        return;
+      }
+      this._statusUnsubscribe();
+      this._statusUnsubscribe = null;
+      if (error && error.code === 'unknown_command') {
+        // Older integration version without the subscription
+        this._startStatusFetching(entityId, showStatus, fpsStatus);
       } else {
-        console.error("Invalid response format:", result);
-        throw new Error("Failed to get signed path");
+        console.error('Error subscribing to status:', error);
       }
+    });
+    
+    // FPS history for the last minutes, from the integration's telemetry
+    this._refreshFpsHistory(entityId, fpsStatus);
+    this._telemetryInterval = setInterval(() => this._refreshFpsHistory(entityId, fpsStatus), 30000);
+  }
+  
+  async _refreshFpsHistory(entityId, fpsStatus) {
+    let history;
+    try {
+      history = await this._hass.callWS({
+        type: 'esp32_robot/telemetry',
+        entity_id: `sensor.${entityId}`,
+        window: 300,
+        buckets: 60,
+      });
     } catch (error) {
-      console.error("Error getting signed URL:", error);
-      throw error;
+      // Older integration version without telemetry
+      return;
+    }
+    if (!this._telemetryInterval || !fpsStatus.parentNode) {
+      // Stopped while the query was running
+      return;
+    }
+    
+    const svgNs = 'http://www.w3.org/2000/svg';
+    if (!this._fpsSparkline) {
+      const sparkline = document.createElementNS(svgNs, 'svg');
+      sparkline.setAttribute('viewBox', `0 0 ${history.fps.avg.length} 20`);
+      sparkline.setAttribute('preserveAspectRatio', 'none');
+      sparkline.style.position = 'absolute';
+      sparkline.style.bottom = '40px';
+      sparkline.style.right = '10px';
+      sparkline.style.width = '80px';
+      sparkline.style.height = '20px';
+      sparkline.style.background = 'rgba(0, 0, 0, 0.5)';
+      sparkline.style.borderRadius = '4px';
+      sparkline.style.zIndex = '10';
+      const line = document.createElementNS(svgNs, 'polyline');
+      line.setAttribute('fill', 'none');
+      line.setAttribute('stroke', '#4caf50');
+      line.setAttribute('stroke-width', '1.5');
+      line.setAttribute('vector-effect', 'non-scaling-stroke');
+      sparkline.appendChild(line);
+      fpsStatus.parentNode.appendChild(sparkline);
+      this._fpsSparkline = sparkline;
     }
+    
+    const values = history.fps.avg;
+    const max = Math.max(1, ...values.filter((value) => value !== null));
+    const points = [];
+    values.forEach((value, index) => {
+      if (value !== null) {
+        points.push(`${index},${(19 - (value / max) * 18).toFixed(1)}`);
+      }
+    });
+    this._fpsSparkline.querySelector('polyline').setAttribute('points', points.join(' '));
   }
   
-  _startStatusPolling(entityId, fpsStatus) {
+  _startStatusFetching(entityId, showStatus, fpsStatus) {
     const statusUrl = `/api/esp32_robot/proxy/${entityId}/status`;
     
-    // Clear existing interval
-    if (this._statusInterval) {
-      clearInterval(this._statusInterval);
-    }
-    
     // Function to update status
     const updateStatus = async () => {
+      if (document.hidden) {
+        return;
+      }
       try {
         const response = await this._hass.fetchWithAuth(statusUrl);
         if (response.ok) {
-          const data = await response.json();
-          // Update FPS with one decimal place
-          if (data.fps !== undefined) {
-            fpsStatus.textContent = `FPS: ${data.fps.toFixed(1)}`;
-            fpsStatus.style.display = 'block';
-        } else {
-            fpsStatus.textContent = 'FPS: --';
-          }
+          showStatus(await response.json());
         } else {
           fpsStatus.textContent = 'FPS: error';
         }
@@ -969,13 +1522,37 @@ class ESP32RobotCard extends LitElement {
     this._statusInterval = setInterval(updateStatus, 2000);
   }
   
+  _stopStatusUpdates() {
+    if (this._statusUnsubscribe) {
+      this._statusUnsubscribe();
+      this._statusUnsubscribe = null;
+    }
+    
+    if (this._statusInterval) {
+      clearInterval(this._statusInterval);
+      this._statusInterval = null;
+    }
+    
+    if (this._telemetryInterval) {
+      clearInterval(this._telemetryInterval);
+      this._telemetryInterval = null;
+    }
+    
+    if (this._fpsSparkline) {
+      this._fpsSparkline.remove();
+      this._fpsSparkline = null;
+    }
+  }
+  
   _initializeJoystick(entityId, joystickContainer, joystickHandle) {
     const baseControlUrl = `/api/esp32_robot/proxy/${entityId}/control`;
     let isDragging = false;
     let currentX = 0, currentY = 0;
     let lastJoystickSendTime = 0;
     let pendingJoystickSend = null;
-    const THROTTLE_MS = 100; // Throttle sending commands to 10 times per second
+    const THROTTLE_MS = 50; // Throttle sending commands to 20 times per second, the server coalesces to the robot's control rate
+    const KEEPALIVE_MS = 300; // Repeat a held vector so the server's dead-man timer does not stop the robot
+    let keepaliveTimer = null;
     
     // Function to send joystick data with throttling
     const sendJoystickData = (x, y, force = false) => {
@@ -1002,6 +1579,26 @@ class ESP32RobotCard extends LitElement {
       }
     };
     
+    // Function to keep repeating the current vector while the stick is held still
+    const startKeepalive = () => {
+      if (keepaliveTimer) return;
+      // Checked every throttle period, so a repeat goes out at most
+      // THROTTLE_MS after it is due instead of up to a whole KEEPALIVE_MS
+      keepaliveTimer = setInterval(() => {
+        if (isDragging && (currentX !== 0 || currentY !== 0) &&
+            Date.now() - lastJoystickSendTime >= KEEPALIVE_MS) {
+          sendJoystickData(currentX, currentY);
+        }
+      }, THROTTLE_MS);
+    };
+    
+    const stopKeepalive = () => {
+      if (keepaliveTimer) {
+        clearInterval(keepaliveTimer);
+        keepaliveTimer = null;
+      }
+    };
+    
     // Function to handle joystick movement
     const handleJoystickMove = (event) => {
       if (!isDragging) return;
@@ -1041,12 +1638,14 @@ class ESP32RobotCard extends LitElement {
         currentX = normalizedX;
         currentY = normalizedY;
         sendJoystickData(normalizedX, normalizedY);
+        startKeepalive();
       }
     };
     
     // Function to reset joystick
     const resetJoystick = (sendData = true) => {
       isDragging = false;
+      stopKeepalive();
       joystickHandle.style.transform = 'translate(-50%, -50%)';
       
       // Send stop command
@@ -1057,8 +1656,34 @@ class ESP32RobotCard extends LitElement {
       }
     };
     
-    // Function to send control command
+    // Function to send control command. Vectors go over the already open
+    // WebSocket connection, the HTTP proxy is only used as a fallback
     this._sendControlCommand = async (url, x, y) => {
+      const vector = {
+        x: parseFloat(x.toFixed(2)), // Convert to float with 2 decimal places for precision
+        y: parseFloat(y.toFixed(2))  // Convert to float with 2 decimal places for precision
+      };
+      
+      if (this._controlOverWebSocket !== false) {
+        try {
+          await this._hass.connection.sendMessagePromise({
+            type: 'esp32_robot/control',
+            entity_id: this._entity.entity_id,
+            ...vector
+          });
+          this._controlOverWebSocket = true;
+          return;
+        } catch (error) {
+          if (error && error.code === 'unknown_command') {
+            // Older integration version without the WebSocket command
+            this._controlOverWebSocket = false;
+          } else {
+            console.error('Error sending control command:', error);
+            return;
+          }
+        }
+      }
+      
       try {
         const response = await this._hass.fetchWithAuth(url, {
           method: 'POST',
@@ -1067,8 +1692,7 @@ class ESP32RobotCard extends LitElement {
           },
           body: JSON.stringify({ 
             mode: 'joystick',
-            x: parseFloat(x.toFixed(2)), // Convert to float with 2 decimal places for precision
-            y: parseFloat(y.toFixed(2))  // Convert to float with 2 decimal places for precision
+            ...vector
           })
         });
         
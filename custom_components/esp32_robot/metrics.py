@@ -0,0 +1,200 @@
+"""Proxy instrumentation for ESP32 Robot."""
+import asyncio
+import bisect
+import logging
+import random
+import time
+
+import aiohttp
+
+from .const import DEFAULT_METRICS_SAMPLE_RATE
+
+_LOGGER = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, the last bucket is open
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # ms
+
+# Seconds over which frame rates are averaged
+RATE_WINDOW = 10
+
+PATH_GROUPS = ("control", "status", "stream")
+PATH_GROUP_OTHER = "other"
+
+ERROR_TIMEOUT = "timeout"
+ERROR_REFUSED = "refused"
+ERROR_OTHER = "other"
+
+
+def path_group(path):
+    """Return the histogram a proxied path is counted in."""
+    return path if path in PATH_GROUPS else PATH_GROUP_OTHER
+
+
+def error_type(err):
+    """Return the error counter an exception is counted in."""
+    if isinstance(err, asyncio.TimeoutError):
+        return ERROR_TIMEOUT
+    if isinstance(err, (ConnectionRefusedError, aiohttp.ClientConnectorError)):
+        return ERROR_REFUSED
+    return ERROR_OTHER
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in milliseconds."""
+
+    def __init__(self):
+        """Initialize an empty histogram."""
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, duration):
+        """Add a duration in milliseconds."""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+
+    def percentile(self, fraction):
+        """Return the bucket bound below which fraction of the durations fall."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        # Beyond the last bucket, report at least its bound
+        return LATENCY_BUCKETS[-1]
+
+    def as_dict(self):
+        """Return the histogram for diagnostics."""
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(LATENCY_BUCKETS, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+class RateCounter:
+    """Counter that also knows its rate per second over the last RATE_WINDOW."""
+
+    def __init__(self):
+        """Initialize the counter."""
+        self.total = 0
+        self._seconds = [0] * (RATE_WINDOW + 1)
+        self._counts = [0] * (RATE_WINDOW + 1)
+
+    def add(self, count=1):
+        """Count events that happened now."""
+        self.total += count
+        second = int(time.monotonic())
+        slot = second % len(self._seconds)
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += count
+
+    @property
+    def rate(self):
+        """Return events per second over the last complete RATE_WINDOW seconds."""
+        now = int(time.monotonic())
+        return round(
+            sum(
+                count
+                for second, count in zip(self._seconds, self._counts)
+                if now - RATE_WINDOW <= second < now
+            )
+            / RATE_WINDOW,
+            1,
+        )
+
+
+class ESP32RobotMetrics:
+    """Performance counters of the proxy for one robot.
+
+    Counters (bytes, frames, errors) are plain integer increments and always
+    kept. Timings are only taken for a `sample_rate` fraction of requests;
+    at 0 no clock is read and no connection tracing is installed.
+    """
+
+    def __init__(self, sample_rate=DEFAULT_METRICS_SAMPLE_RATE / 100):
+        """Initialize empty metrics."""
+        self.sample_rate = sample_rate
+        self.latency = {
+            group: LatencyHistogram() for group in (*PATH_GROUPS, PATH_GROUP_OTHER)
+        }
+        self.connect_time = LatencyHistogram()
+        self.time_to_first_byte = LatencyHistogram()
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.bytes_relayed = 0
+        self.frames_received = RateCounter()
+        self.frames_delivered = RateCounter()
+        self.errors = {ERROR_TIMEOUT: 0, ERROR_REFUSED: 0, ERROR_OTHER: 0}
+
+    def start(self):
+        """Return a start time if this request is sampled, otherwise None."""
+        if self.sample_rate and random.random() < self.sample_rate:
+            return time.monotonic()
+        return None
+
+    def observe(self, histogram, started):
+        """Add the time since a sampled start to a histogram."""
+        if started is not None:
+            histogram.observe((time.monotonic() - started) * 1000)
+
+    def count_error(self, err):
+        """Count a failed upstream request."""
+        self.errors[error_type(err)] += 1
+
+    def trace_config(self):
+        """Return an aiohttp TraceConfig timing new upstream connections.
+
+        Only connection setup is traced, which is rare with pooled
+        connections, so tracing costs nothing on the hot path.
+        """
+        if not self.sample_rate:
+            return None
+
+        async def _on_connection_create_start(session, context, params):
+            context.connect_started = time.monotonic()
+
+        async def _on_connection_create_end(session, context, params):
+            self.connections_created += 1
+            self.observe(self.connect_time, getattr(context, "connect_started", None))
+
+        async def _on_connection_reuseconn(session, context, params):
+            self.connections_reused += 1
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_start.append(_on_connection_create_start)
+        trace_config.on_connection_create_end.append(_on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(_on_connection_reuseconn)
+        return trace_config
+
+    def as_dict(self):
+        """Return all metrics for diagnostics."""
+        return {
+            "sample_rate": self.sample_rate,
+            "latency": {group: histogram.as_dict() for group, histogram in self.latency.items()},
+            "connect_time": self.connect_time.as_dict(),
+            "time_to_first_byte": self.time_to_first_byte.as_dict(),
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "bytes_relayed": self.bytes_relayed,
+            "frames_received": {
+                "total": self.frames_received.total,
+                "fps": self.frames_received.rate,
+            },
+            "frames_delivered": {
+                "total": self.frames_delivered.total,
+                "fps": self.frames_delivered.rate,
+            },
+            "errors": dict(self.errors),
+        }
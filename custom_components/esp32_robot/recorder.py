@@ -0,0 +1,399 @@
+"""On-disk recording of the ESP32 Robot camera stream."""
+import asyncio
+import bisect
+import collections
+import logging
+import mmap
+import os
+import shutil
+import struct
+import time
+from array import array
+
+from homeassistant.core import callback
+
+from .const import DEFAULT_RECORDING_SIZE
+
+_LOGGER = logging.getLogger(__name__)
+
+# Size of one segment file, the ring drops whole segments, oldest first
+SEGMENT_SIZE = 8 * 1024 * 1024
+
+# One index record per frame: timestamp (ms), offset and length in the segment
+INDEX_RECORD = struct.Struct("<QII")
+
+SEGMENT_SUFFIX = ".mjpeg"
+INDEX_SUFFIX = ".idx"
+
+# Frames waiting for the disk before the oldest are dropped
+MAX_PENDING_FRAMES = 100
+
+# Delay before re-joining the stream after it ended, doubled up to the maximum
+RETRY_INTERVAL = 5  # seconds
+MAX_RETRY_INTERVAL = 300  # seconds
+
+# Frames read from disk per executor job during playback
+PLAYBACK_BATCH = 25
+
+# Longest pause between two played back frames, longer gaps are skipped
+MAX_PLAYBACK_GAP = 1000  # ms
+
+
+class RecordingSegment:
+    """One append-only segment file and the in-memory copy of its index."""
+
+    def __init__(self, directory, start):
+        """Initialize an empty segment starting at start (ms)."""
+        self.start = start
+        self.path = os.path.join(directory, f"{start}{SEGMENT_SUFFIX}")
+        self.index_path = os.path.join(directory, f"{start}{INDEX_SUFFIX}")
+        self.timestamps = array("Q")
+        self.offsets = array("I")
+        self.lengths = array("I")
+        self.size = 0
+
+    def add(self, timestamp, offset, length):
+        """Add a frame that is on disk to the index."""
+        self.timestamps.append(timestamp)
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def entry(self, position):
+        """Return the (path, offset, length, timestamp) of a frame."""
+        return (
+            self.path,
+            self.offsets[position],
+            self.lengths[position],
+            self.timestamps[position],
+        )
+
+
+class RecordingReader:
+    """Read recorded frames through memory-mapped segment files.
+
+    Mappings are kept open between reads and only used in the executor.
+    """
+
+    def __init__(self):
+        """Initialize the reader without any mappings."""
+        self._maps = {}
+
+    def read_many(self, entries):
+        """Return (timestamp, frame) for every entry that is still on disk."""
+        frames = []
+        for path, offset, length, timestamp in entries:
+            try:
+                frames.append((timestamp, self._read(path, offset, length)))
+            except (OSError, ValueError):
+                # The ring dropped the segment in the meantime
+                continue
+        return frames
+
+    def _read(self, path, offset, length):
+        """Return length bytes at offset of a segment file."""
+        mapped = self._maps.get(path)
+        if mapped is None or offset + length > len(mapped):
+            # Not mapped yet, or the active segment has grown since
+            if mapped is not None:
+                mapped.close()
+                del self._maps[path]
+            with open(path, "rb") as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = mapped
+        return mapped[offset : offset + length]
+
+    def close(self):
+        """Release all mappings."""
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+
+
+def _read_frame(entry):
+    """Read a single frame, for use in the executor."""
+    reader = RecordingReader()
+    try:
+        frames = reader.read_many([entry])
+    finally:
+        reader.close()
+    return frames[0][1] if frames else None
+
+
+class ESP32RobotRecorder:
+    """Record the camera stream of one robot into a ring of segment files.
+
+    The recorder is a viewer of the stream hub, so the upstream stream stays
+    open while recording. Frames are appended in batches by the executor to
+    segment files of SEGMENT_SIZE, each with an index of (timestamp, offset,
+    length) records. Once the ring holds `max_size` bytes the oldest segment
+    is deleted. The index of all segments is kept in memory for lookups,
+    frames are read back through mmap.
+    """
+
+    def __init__(self, hass, hub, directory, max_size=DEFAULT_RECORDING_SIZE * 1024 * 1024):
+        """Initialize the recorder."""
+        self.hass = hass
+        self._hub = hub
+        self._directory = directory
+        self._max_segments = max(2, max_size // SEGMENT_SIZE)
+        self._segments = []
+        self._segment = None
+        self._last_timestamp = 0
+        self._pending = collections.deque()
+        self._viewer = None
+        self._task = None
+        self._write_task = None
+        # Only used in the executor
+        self._open_segment = None
+        self._data_file = None
+        self._index_file = None
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.write_errors = 0
+
+    @property
+    def info(self):
+        """Return a summary of what is on disk."""
+        segments = [segment for segment in self._segments if segment.timestamps]
+        return {
+            "recording": self._viewer is not None,
+            "start": segments[0].timestamps[0] / 1000 if segments else None,
+            "end": segments[-1].timestamps[-1] / 1000 if segments else None,
+            "frames": sum(len(segment.timestamps) for segment in segments),
+            "bytes": sum(segment.size for segment in self._segments),
+            "segments": len(self._segments),
+            "frames_dropped": self.frames_dropped,
+            "write_errors": self.write_errors,
+        }
+
+    @callback
+    def async_start(self):
+        """Start recording in the background."""
+        self._task = self.hass.async_create_background_task(
+            self._async_run(), f"esp32_robot recorder {self._directory}"
+        )
+
+    async def async_stop(self):
+        """Stop recording and write out pending frames."""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        if self._write_task is not None:
+            await self._write_task
+        await self.hass.async_add_executor_job(self._close_files)
+
+    async def _async_run(self):
+        """Load the existing ring, then record until stopped."""
+        segments = await self.hass.async_add_executor_job(self._load)
+        self._segments = segments
+        if segments:
+            self._last_timestamp = max(
+                segment.timestamps[-1] if segment.timestamps else segment.start
+                for segment in segments
+            )
+        expired = self._expire()
+        if expired:
+            await self.hass.async_add_executor_job(self._write, [], expired)
+
+        retry = RETRY_INTERVAL
+        while True:
+            self._viewer = viewer = self._hub.subscribe()
+            try:
+                while (frame := await viewer.next_frame()) is not None:
+                    retry = RETRY_INTERVAL
+                    self._add_frame(frame)
+            finally:
+                self._viewer = None
+                self._hub.unsubscribe(viewer)
+            _LOGGER.debug("Recording stream ended, rejoining in %s seconds", retry)
+            await asyncio.sleep(retry)
+            retry = min(retry * 2, MAX_RETRY_INTERVAL)
+
+    def _add_frame(self, frame):
+        """Queue a frame for the disk."""
+        # Strictly increasing, so every frame has its own timestamp even if
+        # the clock steps back
+        timestamp = max(int(time.time() * 1000), self._last_timestamp + 1)
+        self._last_timestamp = timestamp
+        self._pending.append((timestamp, frame))
+        if len(self._pending) > MAX_PENDING_FRAMES:
+            self._pending.popleft()
+            self.frames_dropped += 1
+        if self._write_task is None:
+            self._write_task = self.hass.async_create_background_task(
+                self._async_write(), f"esp32_robot recorder write {self._directory}"
+            )
+
+    async def _async_write(self):
+        """Hand queued frames to the executor until the queue is empty."""
+        try:
+            while self._pending:
+                batch = self._plan(self._pending)
+                self._pending.clear()
+                expired = self._expire()
+                try:
+                    await self.hass.async_add_executor_job(self._write, batch, expired)
+                except OSError as err:
+                    _LOGGER.error("Error writing recording to %s: %s", self._directory, err)
+                    self.write_errors += 1
+                    # Offsets of the current segment are unreliable now
+                    self._segment = None
+                    continue
+                for segment, timestamp, offset, frame in batch:
+                    segment.add(timestamp, offset, len(frame))
+                self.frames_written += len(batch)
+        finally:
+            self._write_task = None
+
+    def _plan(self, frames):
+        """Assign every frame a segment and an offset, rolling full segments."""
+        batch = []
+        for timestamp, frame in frames:
+            segment = self._segment
+            if segment is None or (segment.size and segment.size + len(frame) > SEGMENT_SIZE):
+                segment = self._segment = RecordingSegment(self._directory, timestamp)
+                self._segments.append(segment)
+            batch.append((segment, timestamp, segment.size, frame))
+            segment.size += len(frame)
+        return batch
+
+    def _expire(self):
+        """Remove the oldest segments beyond the ring size from the index."""
+        expired = []
+        while len(self._segments) > self._max_segments:
+            expired.append(self._segments.pop(0))
+        return expired
+
+    def _write(self, batch, expired):
+        """Delete expired segments and append a batch of frames (executor)."""
+        for segment in expired:
+            for path in (segment.path, segment.index_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+        try:
+            for segment, timestamp, offset, frame in batch:
+                if segment is not self._open_segment:
+                    self._close_files()
+                    self._data_file = open(segment.path, "ab")
+                    self._index_file = open(segment.index_path, "ab")
+                    self._open_segment = segment
+                self._data_file.write(frame)
+                self._index_file.write(INDEX_RECORD.pack(timestamp, offset, len(frame)))
+            if self._open_segment is not None:
+                # Data before index, an index record never points past the data
+                self._data_file.flush()
+                self._index_file.flush()
+        except OSError:
+            self._close_files()
+            raise
+
+    def _close_files(self):
+        """Close the files of the segment being written (executor)."""
+        for file in (self._data_file, self._index_file):
+            if file is not None:
+                file.close()
+        self._data_file = self._index_file = self._open_segment = None
+
+    def _load(self):
+        """Read the indexes of the segments already on disk (executor)."""
+        os.makedirs(self._directory, exist_ok=True)
+        names = set(os.listdir(self._directory))
+        segments = []
+        for name in names:
+            start, suffix = os.path.splitext(name)
+            if not start.isdigit():
+                continue
+            if suffix == SEGMENT_SUFFIX and f"{start}{INDEX_SUFFIX}" not in names:
+                os.remove(os.path.join(self._directory, name))
+                continue
+            if suffix != INDEX_SUFFIX:
+                continue
+
+            segment = RecordingSegment(self._directory, int(start))
+            try:
+                size = os.path.getsize(segment.path)
+                with open(segment.index_path, "rb") as file:
+                    raw = file.read()
+            except FileNotFoundError:
+                os.remove(segment.index_path)
+                continue
+
+            usable = len(raw) - len(raw) % INDEX_RECORD.size
+            for timestamp, offset, length in INDEX_RECORD.iter_unpack(raw[:usable]):
+                if offset + length > size:
+                    # The frame was cut off when Home Assistant stopped
+                    break
+                segment.add(timestamp, offset, length)
+            segment.size = size
+            segments.append(segment)
+
+        segments.sort(key=lambda segment: segment.start)
+        _LOGGER.debug("Loaded %d recording segments from %s", len(segments), self._directory)
+        return segments
+
+    @callback
+    def async_frame_at(self, timestamp):
+        """Return the entry of the last frame recorded at or before timestamp (ms)."""
+        for segment in reversed(self._segments):
+            if segment.timestamps and segment.timestamps[0] <= timestamp:
+                return segment.entry(bisect.bisect_right(segment.timestamps, timestamp) - 1)
+        return None
+
+    def _entries_after(self, after, end, limit):
+        """Return up to limit entries with after < timestamp <= end, oldest first."""
+        entries = []
+        for segment in self._segments:
+            timestamps = segment.timestamps
+            if not timestamps or timestamps[-1] <= after:
+                continue
+            position = bisect.bisect_right(timestamps, after)
+            while (
+                position < len(timestamps)
+                and timestamps[position] <= end
+                and len(entries) < limit
+            ):
+                entries.append(segment.entry(position))
+                position += 1
+            if position < len(timestamps):
+                # Stopped at end or at limit
+                break
+        return entries
+
+    @callback
+    def async_has_frames(self, start, end):
+        """Return True if frames were recorded between start and end (ms)."""
+        return bool(self._entries_after(start - 1, end, 1))
+
+    async def async_read_frame(self, entry):
+        """Return the JPEG of an entry, or None if it left the ring."""
+        return await self.hass.async_add_executor_job(_read_frame, entry)
+
+    async def async_playback(self, start, end, speed=1.0):
+        """Yield (timestamp, frame) for start..end (ms), paced as recorded."""
+        reader = RecordingReader()
+        cursor = start - 1
+        previous = None
+        try:
+            while entries := self._entries_after(cursor, end, PLAYBACK_BATCH):
+                cursor = entries[-1][3]
+                frames = await self.hass.async_add_executor_job(reader.read_many, entries)
+                for timestamp, frame in frames:
+                    if previous is not None:
+                        gap = min(timestamp - previous, MAX_PLAYBACK_GAP)
+                        await asyncio.sleep(gap / 1000 / speed)
+                    previous = timestamp
+                    yield timestamp, frame
+        finally:
+            await self.hass.async_add_executor_job(reader.close)
+
+
+async def async_remove_recordings(hass, directory):
+    """Delete the recordings of a robot that was removed."""
+    await hass.async_add_executor_job(shutil.rmtree, directory, True)
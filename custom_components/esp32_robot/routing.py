@@ -0,0 +1,75 @@
+"""In-memory routing index for ESP32 Robot requests."""
+import logging
+
+from homeassistant.core import callback, split_entity_id
+from homeassistant.helpers.event import async_track_state_change_event
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class RobotRoute:
+    """Everything a request needs to reach one robot."""
+
+    __slots__ = ("entity_id", "ip_address", "online", "robot")
+
+    def __init__(self, entity_id, ip_address, online, robot):
+        """Initialize the route."""
+        self.entity_id = entity_id
+        self.ip_address = ip_address
+        self.online = online
+        # Runtime data of the config entry (sessions, stream hub, coordinator, ...)
+        self.robot = robot
+
+
+class ESP32RobotRouter:
+    """Index of robots keyed by sensor id, the object id of their sensor entity.
+
+    Routes are added by the sensor entities when they are added to Home
+    Assistant and removed with them, which also happens when the config entry
+    is unloaded or the entity is renamed. The online flag follows the
+    entity's state through a state change listener.
+    """
+
+    def __init__(self, hass):
+        """Initialize an empty index."""
+        self.hass = hass
+        self._routes = {}
+
+    @callback
+    def async_get(self, sensor_id):
+        """Return the route for a sensor id, or None."""
+        return self._routes.get(sensor_id)
+
+    @callback
+    def async_get_by_entity_id(self, entity_id):
+        """Return the route for a full sensor entity id, or None."""
+        route = self._routes.get(split_entity_id(entity_id)[1])
+        if route is None or route.entity_id != entity_id:
+            return None
+        return route
+
+    @callback
+    def async_add(self, entity_id, ip_address, online, robot):
+        """Add a route for a sensor entity and return a callback removing it."""
+        sensor_id = split_entity_id(entity_id)[1]
+        route = RobotRoute(entity_id, ip_address, online, robot)
+        self._routes[sensor_id] = route
+        _LOGGER.debug("Added route %s -> %s", sensor_id, ip_address)
+
+        @callback
+        def _async_state_changed(event):
+            new_state = event.data["new_state"]
+            route.online = new_state is not None and new_state.state == "online"
+
+        unsub_state = async_track_state_change_event(
+            self.hass, [entity_id], _async_state_changed
+        )
+
+        @callback
+        def _async_remove():
+            unsub_state()
+            if self._routes.get(sensor_id) is route:
+                del self._routes[sensor_id]
+                _LOGGER.debug("Removed route %s", sensor_id)
+
+        return _async_remove
@@ -2,12 +2,13 @@
 import logging
 import asyncio
 import aiohttp
-import async_timeout
 import json
+import random
+import time
 from datetime import timedelta
 
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.const import STATE_UNKNOWN
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import STATE_UNKNOWN, EntityCategory
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.core import callback
 from homeassistant.helpers.update_coordinator import (
@@ -15,31 +16,131 @@ from homeassistant.helpers.update_coordinator import (
     DataUpdateCoordinator,
 )
 
-from .const import DOMAIN, CONF_IP_ADDRESS, CONF_UPDATE_INTERVAL
+from .const import (
+    DOMAIN,
+    CONF_IP_ADDRESS,
+    CONF_UPDATE_INTERVAL,
+    CONF_FAST_UPDATE_INTERVAL,
+    CONF_MAX_OFFLINE_INTERVAL,
+    CONF_CONNECT_TIMEOUT,
+    CONF_DIAGNOSTIC_SENSORS,
+    DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_FAST_UPDATE_INTERVAL,
+    DEFAULT_MAX_OFFLINE_INTERVAL,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+)
+from .telemetry import (
+    ESP32RobotTelemetry,
+    POLL_OK,
+    POLL_TIMEOUT,
+    POLL_CONNECTION_ERROR,
+    POLL_HTTP_ERROR,
+    POLL_INVALID_RESPONSE,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
-DEFAULT_UPDATE_INTERVAL = timedelta(seconds=30)
+# Seconds the robot counts as being driven after the last control command
+ACTIVE_HOLD_TIME = 30
+
+# Fraction of the offline backoff that is randomized, so a fleet of robots
+# that went offline together does not get polled in lockstep
+BACKOFF_JITTER = 0.2
+
+POLL_MODE_FAST = "fast"
+POLL_MODE_IDLE = "idle"
+POLL_MODE_OFFLINE = "offline"
+
+# Optional diagnostic sensors: key, name, unit, state class and how to read
+# the value from the robot's runtime data
+DIAGNOSTIC_SENSORS = (
+    ("control_latency", "Control latency p95", "ms", SensorStateClass.MEASUREMENT,
+     lambda robot: robot["metrics"].latency["control"].percentile(0.95)),
+    ("request_latency", "Request latency p95", "ms", SensorStateClass.MEASUREMENT,
+     lambda robot: robot["metrics"].latency["other"].percentile(0.95)),
+    ("connect_time", "Connect time p95", "ms", SensorStateClass.MEASUREMENT,
+     lambda robot: robot["metrics"].connect_time.percentile(0.95)),
+    ("time_to_first_byte", "Time to first byte p95", "ms", SensorStateClass.MEASUREMENT,
+     lambda robot: robot["metrics"].time_to_first_byte.percentile(0.95)),
+    ("bytes_relayed", "Bytes relayed", "B", SensorStateClass.TOTAL_INCREASING,
+     lambda robot: robot["metrics"].bytes_relayed),
+    ("stream_viewers", "Stream viewers", None, SensorStateClass.MEASUREMENT,
+     lambda robot: robot["stream_hub"].viewer_count),
+    ("frames_received", "Frames received", "fps", SensorStateClass.MEASUREMENT,
+     lambda robot: robot["metrics"].frames_received.rate),
+    ("frames_delivered", "Frames delivered", "fps", SensorStateClass.MEASUREMENT,
+     lambda robot: robot["metrics"].frames_delivered.rate),
+    ("proxy_errors", "Proxy errors", None, SensorStateClass.TOTAL_INCREASING,
+     lambda robot: sum(robot["metrics"].errors.values())),
+)
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up the ESP32 Robot sensor."""
     ip_address = config_entry.data.get(CONF_IP_ADDRESS)
-    update_interval = timedelta(seconds=config_entry.data.get(CONF_UPDATE_INTERVAL, 30))
+    options = config_entry.options
+    update_interval = options.get(
+        CONF_UPDATE_INTERVAL,
+        config_entry.data.get(CONF_UPDATE_INTERVAL, DEFAULT_UPDATE_INTERVAL),
+    )
 
     coordinator = ESP32RobotDataCoordinator(
-        hass, ip_address=ip_address, update_interval=update_interval
+        hass,
+        ip_address=ip_address,
+        update_interval=timedelta(seconds=update_interval),
+        fast_update_interval=timedelta(
+            seconds=options.get(CONF_FAST_UPDATE_INTERVAL, DEFAULT_FAST_UPDATE_INTERVAL)
+        ),
+        max_offline_interval=timedelta(
+            seconds=options.get(CONF_MAX_OFFLINE_INTERVAL, DEFAULT_MAX_OFFLINE_INTERVAL)
+        ),
+        connect_timeout=options.get(CONF_CONNECT_TIMEOUT, DEFAULT_CONNECT_TIMEOUT),
     )
 
-    # Fetch initial data
-    await coordinator.async_refresh()
+    hass.data[DOMAIN][config_entry.entry_id]["coordinator"] = coordinator
+
+    # Entities start out unknown; an unreachable robot must not hold up
+    # setup, so the first poll runs in the background
+    entities = [ESP32RobotSensor(coordinator, ip_address)]
+    if options.get(CONF_DIAGNOSTIC_SENSORS, False):
+        robot = hass.data[DOMAIN][config_entry.entry_id]
+        entities.extend(
+            ESP32RobotDiagnosticSensor(coordinator, ip_address, robot, *description)
+            for description in DIAGNOSTIC_SENSORS
+        )
+    async_add_entities(entities)
 
-    async_add_entities([ESP32RobotSensor(coordinator, ip_address)], True)
+    fleet = hass.data[DOMAIN].get("fleet")
+    if fleet is not None:
+        # The fleet poller staggers the first polls itself
+        config_entry.async_on_unload(fleet.async_add(coordinator))
+    else:
+        config_entry.async_create_background_task(
+            hass,
+            coordinator.async_first_poll(),
+            f"esp32_robot first poll {ip_address}",
+        )
 
 
 class ESP32RobotDataCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching ESP32 Robot data."""
+    """Class to manage fetching ESP32 Robot data.
 
-    def __init__(self, hass, ip_address, update_interval=DEFAULT_UPDATE_INTERVAL):
+    The refresh interval adapts to what the robot is doing: the fast interval
+    while it streams, is driven or a card shows its live status, the regular
+    update interval while it is idle, and an exponential backoff with jitter,
+    starting from the fast interval, while it is offline.
+    """
+
+    def __init__(
+        self,
+        hass,
+        ip_address,
+        update_interval=timedelta(seconds=DEFAULT_UPDATE_INTERVAL),
+        fast_update_interval=timedelta(seconds=DEFAULT_FAST_UPDATE_INTERVAL),
+        max_offline_interval=timedelta(seconds=DEFAULT_MAX_OFFLINE_INTERVAL),
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+    ):
         """Initialize ESP32 Robot data coordinator."""
         super().__init__(
             hass,
@@ -50,27 +151,144 @@ class ESP32RobotDataCoordinator(DataUpdateCoordinator):
         self.ip_address = ip_address
         self.session = async_get_clientsession(hass)
         self.last_error = None
+        self._idle_interval = update_interval
+        self._fast_interval = min(fast_update_interval, update_interval)
+        self._max_offline_interval = max(max_offline_interval, update_interval)
+        # A short connect timeout finds an unreachable robot quickly, the
+        # read timeout still allows a busy robot to answer
+        self._timeout = aiohttp.ClientTimeout(
+            total=connect_timeout + read_timeout,
+            sock_connect=connect_timeout,
+            sock_read=read_timeout,
+        )
+        self._status_subscribers = 0
+        self._active_until = 0.0
+        self._offline_polls = 0
+        self.poll_mode = POLL_MODE_IDLE
+        self.last_poll_time = None
+        # Per-poll history, kept out of the state machine and the recorder
+        self.telemetry = ESP32RobotTelemetry()
+        self._poll_result = POLL_OK
+        # Set while ESP32RobotFleetPoller schedules the refreshes
+        self.fleet_managed = False
+
+    async def async_first_poll(self):
+        """Run the first refresh and log how long it took."""
+        started = time.monotonic()
+        await self.async_refresh()
+        _LOGGER.debug(
+            "First poll of %s took %.3fs (%s)",
+            self.ip_address, time.monotonic() - started, self.poll_mode,
+        )
+
+    @callback
+    def _schedule_refresh(self):
+        """Schedule the next refresh, unless the fleet poller does it."""
+        if not self.fleet_managed:
+            super()._schedule_refresh()
+
+    @callback
+    def async_set_unreachable(self, error):
+        """Mark the robot offline when a poll was abandoned."""
+        self.last_error = error
+        data = {"status": "offline", "error": error}
+        self.telemetry.add(time.time(), error=POLL_TIMEOUT)
+        self.update_interval = self._next_update_interval(data)
+        self.async_set_updated_data(data)
+
+    @callback
+    def async_add_status_subscriber(self):
+        """Poll faster while a card shows live status.
+
+        Returns a callback that removes the subscriber again.
+        """
+        self._status_subscribers += 1
+        if self._status_subscribers == 1:
+            self._async_speed_up()
+
+        @callback
+        def _async_remove():
+            self._status_subscribers -= 1
+
+        return _async_remove
+
+    @callback
+    def async_mark_active(self):
+        """Poll faster for a while because the robot is being driven."""
+        was_active = time.monotonic() < self._active_until
+        self._active_until = time.monotonic() + ACTIVE_HOLD_TIME
+        if not was_active:
+            self._async_speed_up()
+
+    @callback
+    def _async_speed_up(self):
+        """Switch to the fast interval now instead of after the current one."""
+        if self.poll_mode == POLL_MODE_IDLE:
+            self.update_interval = self._fast_interval
+            self.hass.async_create_task(self.async_request_refresh())
+
+    def _next_update_interval(self, data):
+        """Pick the poll mode and interval following an update."""
+        if data.get("status") != "online":
+            self.poll_mode = POLL_MODE_OFFLINE
+            backoff = self._fast_interval * 2 ** min(self._offline_polls, 16)
+            self._offline_polls += 1
+            backoff = min(backoff, self._max_offline_interval)
+            return backoff * random.uniform(1 - BACKOFF_JITTER, 1)
+
+        self._offline_polls = 0
+        if (
+            self._status_subscribers
+            or data.get("streaming")
+            or time.monotonic() < self._active_until
+        ):
+            self.poll_mode = POLL_MODE_FAST
+            return self._fast_interval
+
+        self.poll_mode = POLL_MODE_IDLE
+        return self._idle_interval
 
     async def _async_update_data(self):
-        """Fetch data from ESP32 Robot."""
+        """Fetch data from ESP32 Robot and schedule the next poll."""
+        data = await self._async_fetch_status()
+        fps = data.get("fps")
+        self.telemetry.add(
+            time.time(),
+            fps=fps if isinstance(fps, (int, float)) else None,
+            streaming=data.get("streaming"),
+            latency=(time.monotonic() - self.last_poll_time) * 1000,
+            error=self._poll_result,
+        )
+        # The next refresh is scheduled with update_interval once this returns
+        self.update_interval = self._next_update_interval(data)
+        return data
+
+    async def _async_fetch_status(self):
+        """Fetch the status from ESP32 Robot."""
+        self.last_poll_time = time.monotonic()
         try:
-            async with async_timeout.timeout(10):
-                url = f"http://{self.ip_address}/status"
-                async with self.session.get(url) as response:
-                    if response.status != 200:
-                        self.last_error = f"Error fetching status: HTTP {response.status}"
-                        return {"status": "offline", "error": self.last_error}
-                    
-                    try:
-                        data = await response.json()
-                        # Add online status to data
-                        data["status"] = "online"
-                        self.last_error = None
-                        return data
-                    except json.JSONDecodeError:
-                        self.last_error = "Invalid JSON response from robot"
-                        return {"status": "offline", "error": self.last_error}
+            url = f"http://{self.ip_address}/status"
+            async with self.session.get(url, timeout=self._timeout) as response:
+                if response.status != 200:
+                    self._poll_result = POLL_HTTP_ERROR
+                    self.last_error = f"Error fetching status: HTTP {response.status}"
+                    return {"status": "offline", "error": self.last_error}
+                
+                try:
+                    data = await response.json()
+                    # Add online status to data
+                    data["status"] = "online"
+                    self._poll_result = POLL_OK
+                    self.last_error = None
+                    return data
+                except json.JSONDecodeError:
+                    self._poll_result = POLL_INVALID_RESPONSE
+                    self.last_error = "Invalid JSON response from robot"
+                    return {"status": "offline", "error": self.last_error}
         except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            self._poll_result = (
+                POLL_TIMEOUT if isinstance(err, asyncio.TimeoutError) else POLL_CONNECTION_ERROR
+            )
             self.last_error = f"Error connecting to robot: {str(err)}"
             return {"status": "offline", "error": self.last_error}
 
@@ -86,9 +304,21 @@ class ESP32RobotSensor(CoordinatorEntity, SensorEntity):
         self._attr_name = f"ESP32 Robot {ip_address}"
         self._attr_icon = "mdi:robot"
 
+    async def async_added_to_hass(self):
+        """Register the robot in the routing index once the entity id is known."""
+        await super().async_added_to_hass()
+        router = self.hass.data[DOMAIN]["router"]
+        robot = self.hass.data[DOMAIN][self.platform.config_entry.entry_id]
+        self.async_on_remove(
+            router.async_add(self.entity_id, self.ip_address, self.state == "online", robot)
+        )
+
     @property
     def state(self):
         """Return the state of the sensor."""
+        if self.coordinator.data is None:
+            # Not polled yet
+            return STATE_UNKNOWN
         return self.coordinator.data.get("status", STATE_UNKNOWN)
 
     @property
@@ -114,4 +344,30 @@ class ESP32RobotSensor(CoordinatorEntity, SensorEntity):
             if self.coordinator.last_error:
                 attrs["last_error"] = self.coordinator.last_error
         
-        return attrs 
\ No newline at end of file
+        return attrs 
+
+
+class ESP32RobotDiagnosticSensor(CoordinatorEntity, SensorEntity):
+    """Proxy metric of an ESP32 Robot, refreshed with every status poll."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, coordinator, ip_address, robot, key, name, unit, state_class, value_fn):
+        """Initialize the sensor."""
+        super().__init__(coordinator)
+        self._robot = robot
+        self._value_fn = value_fn
+        self._attr_unique_id = f"esp32_robot_{ip_address.replace('.', '_')}_{key}"
+        self._attr_name = f"ESP32 Robot {ip_address} {name}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+
+    @property
+    def available(self):
+        """Return True, the metrics are kept by Home Assistant itself."""
+        return True
+
+    @property
+    def native_value(self):
+        """Return the current value of the metric."""
+        return self._value_fn(self._robot)
@@ -0,0 +1,77 @@
+"""Pooled upstream HTTP sessions for ESP32 Robot."""
+import logging
+
+import aiohttp
+
+from .const import (
+    DEFAULT_CONTROL_CONNECTIONS,
+    DEFAULT_KEEPALIVE_TIMEOUT,
+    DEFAULT_STREAM_CONNECTIONS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Timeouts for requests on the control session
+REQUEST_TIMEOUT = 30  # seconds
+CONNECT_TIMEOUT = 10  # seconds
+
+# Longest a running stream may go without data, a few seconds above the
+# frame interval of even a slow camera, so a half-open connection ends
+STREAM_READ_TIMEOUT = 10  # seconds
+
+
+class ESP32RobotSessions:
+    """Long-lived connection pools to a single robot.
+
+    Short requests and long-lived streams use separate pools so an open
+    MJPEG stream never holds the socket a joystick command is waiting for.
+    """
+
+    def __init__(
+        self,
+        ip_address,
+        keepalive_timeout=DEFAULT_KEEPALIVE_TIMEOUT,
+        control_connections=DEFAULT_CONTROL_CONNECTIONS,
+        stream_connections=DEFAULT_STREAM_CONNECTIONS,
+        trace_config=None,
+    ):
+        """Create the control and stream sessions."""
+        self.ip_address = ip_address
+        trace_configs = [trace_config] if trace_config is not None else None
+        self.control = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=control_connections,
+                keepalive_timeout=keepalive_timeout,
+            ),
+            # Bounded per read rather than in total, so large bodies relayed
+            # by the proxy are not cut off while they are still moving
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=CONNECT_TIMEOUT, sock_read=REQUEST_TIMEOUT
+            ),
+            # The proxy passes bodies through untouched, Content-Encoding included
+            auto_decompress=False,
+            trace_configs=trace_configs,
+        )
+        # Streams run indefinitely, so only the connect phase and the gap
+        # between reads are bounded. Keep-alive is pointless here: a
+        # finished stream closes its socket.
+        self.stream = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=stream_connections,
+                force_close=True,
+            ),
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=CONNECT_TIMEOUT, sock_read=STREAM_READ_TIMEOUT
+            ),
+            trace_configs=trace_configs,
+        )
+
+    def session_for(self, path):
+        """Return the session that should carry a request for path."""
+        return self.stream if path == "stream" else self.control
+
+    async def async_close(self):
+        """Close both sessions and their pooled connections."""
+        _LOGGER.debug("Closing upstream sessions for %s", self.ip_address)
+        await self.control.close()
+        await self.stream.close()
@@ -0,0 +1,552 @@
+"""Shared MJPEG stream hub for ESP32 Robot."""
+import asyncio
+import hashlib
+import io
+import logging
+import time
+
+import aiohttp
+import async_timeout
+
+try:
+    from PIL import Image
+except ImportError:  # Scaled tiers fall back to full resolution
+    Image = None
+
+from .const import DEFAULT_SNAPSHOT_TTL
+
+_LOGGER = logging.getLogger(__name__)
+
+# Seconds to keep the upstream stream open after the last viewer leaves,
+# so a dialog reopen or a page reload does not reconnect to the robot
+STREAM_GRACE_PERIOD = 5
+
+# Upper bound for fetching a single frame, or waiting for the running
+# stream's next one
+SNAPSHOT_FETCH_TIMEOUT = 10
+
+# A single JPEG from the ESP32 camera is far below this even at UXGA
+MAX_FRAME_SIZE = 2 * 1024 * 1024
+
+# Boundary used on the Home Assistant side of the relay
+FRAME_BOUNDARY = "frame"
+
+# Frame rates a viewer tier may ask for
+MIN_TIER_FPS = 0.1
+MAX_TIER_FPS = 30
+
+# Scales of viewer tiers, the ones a JPEG decoder produces natively (DCT
+# scaling), so a scaled frame costs one reduced-size decode and one encode
+TIER_SCALES = (1, 0.5, 0.25, 0.125)
+
+# JPEG quality of downscaled frames
+SCALED_JPEG_QUALITY = 70
+
+
+class MJPEGParser:
+    """Incremental parser splitting a multipart MJPEG body into JPEG frames."""
+
+    def __init__(self, boundary):
+        """Initialize the parser for the given multipart boundary."""
+        self._delimiter = b"--" + boundary.encode()
+        self._buffer = bytearray()
+
+    @classmethod
+    def from_content_type(cls, content_type):
+        """Create a parser from a multipart Content-Type header, if possible."""
+        for param in content_type.split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.lower() == "boundary" and value:
+                return cls(value.strip('"'))
+        return None
+
+    def feed(self, data):
+        """Add received bytes and return the list of completed frames."""
+        buffer = self._buffer
+        buffer += data
+        frames = []
+
+        while True:
+            start = buffer.find(self._delimiter)
+            if start < 0:
+                # Keep just enough to match a delimiter split across chunks
+                del buffer[: max(0, len(buffer) - len(self._delimiter))]
+                break
+
+            headers_end = buffer.find(b"\r\n\r\n", start)
+            if headers_end < 0:
+                del buffer[:start]
+                break
+
+            body_start = headers_end + 4
+            length = _content_length(buffer[start:headers_end])
+
+            if length is not None:
+                body_end = body_start + length
+                if len(buffer) < body_end:
+                    del buffer[:start]
+                    break
+                next_start = body_end
+            else:
+                body_end = buffer.find(self._delimiter, body_start)
+                if body_end < 0:
+                    del buffer[:start]
+                    break
+                next_start = body_end
+                # The CRLF before the next delimiter belongs to the delimiter
+                while body_end > body_start and buffer[body_end - 1] in b"\r\n":
+                    body_end -= 1
+
+            if body_end > body_start:
+                frames.append(bytes(buffer[body_start:body_end]))
+            del buffer[:next_start]
+
+        if len(buffer) > MAX_FRAME_SIZE:
+            _LOGGER.warning("Discarding oversized MJPEG part (%d bytes)", len(buffer))
+            buffer.clear()
+
+        return frames
+
+
+def _content_length(raw_headers):
+    """Return the Content-Length of a multipart part, if it has one."""
+    for line in bytes(raw_headers).split(b"\r\n"):
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            try:
+                return int(value.strip())
+            except ValueError:
+                return None
+    return None
+
+
+def scale_frame(frame, scale):
+    """Return a JPEG frame downscaled by scale, or the frame itself on failure.
+
+    Runs in the executor.
+    """
+    try:
+        image = Image.open(io.BytesIO(frame))
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # Decode straight at the reduced size instead of decoding and resizing
+        image.draft("RGB", size)
+        image = image.convert("RGB")
+        if image.size != size:
+            image = image.resize(size)
+        output = io.BytesIO()
+        image.save(output, "JPEG", quality=SCALED_JPEG_QUALITY)
+        return output.getvalue()
+    except (OSError, ValueError) as err:
+        _LOGGER.debug("Could not scale frame: %s", err)
+        return frame
+
+
+def tier_key(fps=None, scale=1):
+    """Return the (fps, scale) tier serving a viewer's request.
+
+    Scales snap down to TIER_SCALES and frame rates to tenths, so close
+    requests share a tier and its work.
+    """
+    if Image is None:
+        scale = 1
+    scale = next((tier_scale for tier_scale in TIER_SCALES if tier_scale <= scale), TIER_SCALES[-1])
+    if fps is not None:
+        fps = round(min(max(fps, MIN_TIER_FPS), MAX_TIER_FPS), 1)
+    return fps, scale
+
+
+class StreamTier:
+    """Viewers sharing a frame rate and scale, and the frames made for them."""
+
+    def __init__(self, key):
+        """Initialize the tier for an (fps, scale) key."""
+        self.key = key
+        self.fps, self.scale = key
+        self.viewers = set()
+        self.frame = None
+        self.scaling = False
+        self._next_due = 0.0
+
+    def due(self, now):
+        """Return True if a frame arriving now is the tier's next frame."""
+        if self.fps is None:
+            return True
+        if now < self._next_due:
+            return False
+        interval = 1 / self.fps
+        # Keep the average rate, unless the stream stalled for longer than
+        # an interval, in which case start over instead of bursting
+        if now - self._next_due < interval:
+            self._next_due += interval
+        else:
+            self._next_due = now + interval
+        return True
+
+    def publish(self, frame):
+        """Hand a frame to every viewer of the tier."""
+        self.frame = frame
+        for viewer in self.viewers:
+            viewer.put(frame)
+
+
+def encode_frame(frame):
+    """Return a JPEG frame wrapped as one multipart part."""
+    return (
+        b"--" + FRAME_BOUNDARY.encode() + b"\r\n"
+        b"Content-Type: image/jpeg\r\n"
+        b"Content-Length: " + str(len(frame)).encode() + b"\r\n\r\n"
+        + frame + b"\r\n"
+    )
+
+
+class StreamViewer:
+    """Latest-frame slot for a single viewer.
+
+    A viewer that cannot keep up skips straight to the newest frame instead
+    of working through a backlog, so its latency stays flat.
+    """
+
+    def __init__(self):
+        """Initialize an empty slot."""
+        self._frame = None
+        self._ended = False
+        self._event = asyncio.Event()
+        self.frames_delivered = 0
+        self.frames_dropped = 0
+
+    def put(self, frame):
+        """Store a new frame, replacing one the viewer has not taken yet."""
+        if self._frame is not None:
+            self.frames_dropped += 1
+        self._frame = frame
+        self._event.set()
+
+    def end(self):
+        """Mark the stream as ended."""
+        self._ended = True
+        self._event.set()
+
+    async def next_frame(self):
+        """Wait for the newest frame, or return None once the stream ended."""
+        await self._event.wait()
+        self._event.clear()
+        if self._ended:
+            return None
+        frame, self._frame = self._frame, None
+        self.frames_delivered += 1
+        return frame
+
+
+class Snapshot:
+    """A single JPEG frame with its validators for conditional requests."""
+
+    def __init__(self, frame, timestamp):
+        """Initialize the snapshot, hashing the frame for its ETag."""
+        self.frame = frame
+        self.timestamp = timestamp
+        self.etag = f'"{hashlib.blake2b(frame, digest_size=12).hexdigest()}"'
+
+
+class ESP32RobotStreamHub:
+    """Share a single upstream `/stream` connection between all viewers.
+
+    The upstream connection is opened when the first viewer subscribes and
+    closed once the last viewer has been gone for STREAM_GRACE_PERIOD.
+
+    Viewers may ask for a lower frame rate and scale. Viewers asking for the
+    same tier share it: frames are decimated and downscaled once per tier,
+    in the executor, and a tier whose previous frame is still being scaled
+    skips the frame.
+    """
+
+    def __init__(
+        self,
+        hass,
+        sessions,
+        grace_period=STREAM_GRACE_PERIOD,
+        snapshot_ttl=DEFAULT_SNAPSHOT_TTL,
+        metrics=None,
+    ):
+        """Initialize the hub for one robot."""
+        self.hass = hass
+        self._sessions = sessions
+        self._metrics = metrics
+        self._grace_period = grace_period
+        self._snapshot_ttl = snapshot_ttl
+        self._subscribers = {}
+        self._tiers = {}
+        self._task = None
+        self._stop_handle = None
+        self.frames_received = 0
+        self._latest_frame = None
+        self._latest_frame_time = None
+        self._stopstream_task = None
+        self._fetch_task = None
+        self._frame_waiters = set()
+        self._snapshot = None
+        self._snapshot_lock = asyncio.Lock()
+
+    @property
+    def viewer_count(self):
+        """Return the number of subscribed viewers."""
+        return len(self._subscribers)
+
+    @property
+    def tiers(self):
+        """Return the viewer count of each tier, keyed "<fps>fps@<scale>"."""
+        return {
+            f"{tier.fps or 'all'}fps@{tier.scale}": len(tier.viewers)
+            for tier in self._tiers.values()
+        }
+
+    def subscribe(self, fps=None, scale=1):
+        """Register a viewer and return its StreamViewer.
+
+        Without fps the viewer gets every frame, scale below 1 downscales
+        the frames (see tier_key).
+        """
+        key = tier_key(fps, scale)
+        tier = self._tiers.get(key)
+        if tier is None:
+            tier = self._tiers[key] = StreamTier(key)
+        viewer = StreamViewer()
+        tier.viewers.add(viewer)
+        self._subscribers[viewer] = tier
+        if self._task is not None and tier.frame is not None:
+            # Show the tier's latest frame right away instead of a blank image
+            viewer.put(tier.frame)
+
+        if self._stop_handle is not None:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(
+                self._async_run(), f"esp32_robot stream {self._sessions.ip_address}"
+            )
+        return viewer
+
+    def unsubscribe(self, viewer):
+        """Remove a viewer, scheduling the upstream stop if it was the last."""
+        tier = self._subscribers.pop(viewer, None)
+        if tier is not None:
+            tier.viewers.discard(viewer)
+            if not tier.viewers and self._tiers.get(tier.key) is tier:
+                del self._tiers[tier.key]
+        if not self._subscribers and self._task is not None and self._stop_handle is None:
+            self._stop_handle = self.hass.loop.call_later(
+                self._grace_period, self._stop_if_idle
+            )
+
+    def _stop_if_idle(self):
+        """Stop the upstream stream if nobody rejoined during the grace period."""
+        self._stop_handle = None
+        if not self._subscribers and self._task is not None:
+            _LOGGER.debug("No viewers left for %s, closing upstream stream", self._sessions.ip_address)
+            self._task.cancel()
+            self._task = None
+            self._stopstream_task = self.hass.async_create_background_task(
+                self._async_send_stopstream(), f"esp32_robot stopstream {self._sessions.ip_address}"
+            )
+
+    async def _async_send_stopstream(self):
+        """Tell the robot it can stop encoding frames.
+
+        A stream started meanwhile waits for this request before connecting.
+        """
+        try:
+            if self._task is not None:
+                # A new viewer arrived in the meantime
+                return
+            async with self._sessions.control.get(
+                f"http://{self._sessions.ip_address}/stopstream"
+            ) as response:
+                await response.read()
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.debug("Error stopping stream on %s: %s", self._sessions.ip_address, err)
+        finally:
+            if self._stopstream_task is asyncio.current_task():
+                self._stopstream_task = None
+
+    async def async_stop(self):
+        """Close the upstream stream immediately."""
+        if self._stop_handle is not None:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._end_subscribers()
+        self._release_frame_waiters()
+
+    async def async_snapshot(self):
+        """Return the most recent frame as a Snapshot, or None if unavailable.
+
+        While a stream is running this is the newest frame seen on it, or
+        the next one, and costs the robot nothing. Otherwise the last known
+        frame is reused for the snapshot TTL before a single new frame is
+        fetched; a stream starting meanwhile waits for that fetch, so the
+        robot never serves two streams.
+        """
+        if self._task is None:
+            async with self._snapshot_lock:
+                # Requests waiting on the lock reuse the frame fetched by the first
+                if (
+                    self._snapshot is not None
+                    and time.time() - self._snapshot.timestamp < self._snapshot_ttl
+                ):
+                    return self._snapshot
+
+                if self._stopstream_task is not None:
+                    # A /stopstream arriving after the /stream would end it
+                    await asyncio.wait([self._stopstream_task])
+
+                if self._task is None:
+                    self._fetch_task = self.hass.async_create_background_task(
+                        self._async_fetch_frame(),
+                        f"esp32_robot snapshot {self._sessions.ip_address}",
+                    )
+                    try:
+                        frame = await self._fetch_task
+                    finally:
+                        self._fetch_task = None
+                    if frame is None:
+                        return None
+                    return self._snapshot_of(frame, time.time())
+
+        if self._latest_frame is None and await self._async_next_frame() is None:
+            return None
+        return self._snapshot_of(self._latest_frame, self._latest_frame_time)
+
+    async def _async_next_frame(self):
+        """Wait for the running stream's next frame, None if it ends first."""
+        waiter = self.hass.loop.create_future()
+        self._frame_waiters.add(waiter)
+        try:
+            async with async_timeout.timeout(SNAPSHOT_FETCH_TIMEOUT):
+                return await waiter
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._frame_waiters.discard(waiter)
+
+    def _release_frame_waiters(self, frame=None):
+        """Hand a frame, or None when the stream ended, to waiting snapshots."""
+        for waiter in self._frame_waiters:
+            if not waiter.done():
+                waiter.set_result(frame)
+        self._frame_waiters.clear()
+
+    def _snapshot_of(self, frame, timestamp):
+        """Return the Snapshot for frame, hashing each frame only once."""
+        if self._snapshot is None or self._snapshot.frame is not frame:
+            self._snapshot = Snapshot(frame, timestamp)
+        return self._snapshot
+
+    async def _async_fetch_frame(self):
+        """Read a single frame from the robot's stream and disconnect."""
+        url = f"http://{self._sessions.ip_address}/stream"
+        try:
+            async with async_timeout.timeout(SNAPSHOT_FETCH_TIMEOUT):
+                async with self._sessions.stream.get(url) as response:
+                    parser = MJPEGParser.from_content_type(
+                        response.headers.get("Content-Type", "")
+                    )
+                    if response.status != 200 or parser is None:
+                        return None
+                    async for chunk in response.content.iter_any():
+                        frames = parser.feed(chunk)
+                        if frames:
+                            return frames[0]
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.debug("Error fetching snapshot from %s: %s", url, err)
+            if self._metrics is not None:
+                self._metrics.count_error(err)
+        return None
+
+    def _publish(self, frame):
+        """Hand a frame to every tier that is due one."""
+        self.frames_received += 1
+        if self._metrics is not None:
+            self._metrics.frames_received.add()
+        self._latest_frame = frame
+        self._latest_frame_time = time.time()
+        if self._frame_waiters:
+            self._release_frame_waiters(frame)
+        now = time.monotonic()
+        for tier in self._tiers.values():
+            if not tier.due(now):
+                continue
+            if tier.scale == 1:
+                tier.publish(frame)
+            elif not tier.scaling:
+                tier.scaling = True
+                self.hass.async_create_background_task(
+                    self._async_publish_scaled(tier, frame),
+                    f"esp32_robot scale frame {self._sessions.ip_address}",
+                )
+
+    async def _async_publish_scaled(self, tier, frame):
+        """Downscale a frame in the executor and hand it to the tier."""
+        try:
+            scaled = await self.hass.async_add_executor_job(scale_frame, frame, tier.scale)
+        finally:
+            tier.scaling = False
+        if self._tiers.get(tier.key) is tier:
+            tier.publish(scaled)
+
+    def _end_subscribers(self):
+        """Signal end of stream to every viewer and forget them."""
+        for viewer in self._subscribers:
+            viewer.end()
+        self._subscribers.clear()
+        self._tiers.clear()
+
+    async def _async_run(self):
+        """Read the upstream stream and fan frames out to the viewers."""
+        url = f"http://{self._sessions.ip_address}/stream"
+        _LOGGER.debug("Opening upstream stream %s", url)
+        # Frames of a previous stream are not the latest anymore
+        self._clear_latest_frame()
+        if self._stopstream_task is not None:
+            # A /stopstream arriving after the new /stream would end it
+            await asyncio.wait([self._stopstream_task])
+        if self._fetch_task is not None:
+            # The robot serves one stream, let a snapshot fetch finish first
+            await asyncio.wait([self._fetch_task])
+        try:
+            async with self._sessions.stream.get(url) as response:
+                content_type = response.headers.get("Content-Type", "")
+                parser = MJPEGParser.from_content_type(content_type)
+                if response.status != 200 or parser is None:
+                    _LOGGER.error(
+                        "Unexpected stream response from %s: HTTP %s, %s",
+                        url, response.status, content_type,
+                    )
+                    return
+
+                async for chunk in response.content.iter_any():
+                    for frame in parser.feed(chunk):
+                        self._publish(frame)
+            _LOGGER.debug("Upstream stream %s ended", url)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            _LOGGER.warning("Error reading stream from %s: %s", url, err)
+            if self._metrics is not None:
+                self._metrics.count_error(err)
+        finally:
+            if self._task is asyncio.current_task():
+                self._task = None
+                self._end_subscribers()
+            if self._task is None:
+                # Unless a new stream already replaced this one
+                self._clear_latest_frame()
+                self._release_frame_waiters()
+
+    def _clear_latest_frame(self):
+        """Forget the latest frame, snapshots then fetch a frame on their own."""
+        self._latest_frame = None
+        self._latest_frame_time = None
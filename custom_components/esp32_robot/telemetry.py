@@ -0,0 +1,134 @@
+"""In-memory status history for ESP32 Robot."""
+import bisect
+import math
+from array import array
+
+# Samples kept per robot, about two hours at the fast poll interval. Each
+# sample takes 18 bytes, so the ring is ~72 KiB whatever the poll rate.
+TELEMETRY_CAPACITY = 4096
+
+# Outcome of a status poll, stored as one byte per sample
+POLL_OK = 0
+POLL_TIMEOUT = 1
+POLL_CONNECTION_ERROR = 2
+POLL_HTTP_ERROR = 3
+POLL_INVALID_RESPONSE = 4
+
+NAN = float("nan")
+
+
+class ESP32RobotTelemetry:
+    """Fixed-size ring of status samples, stored column-wise in arrays.
+
+    A sample holds the poll time, fps, streaming flag, poll latency and poll
+    outcome. The history never goes through the state machine or the
+    recorder, it is only read by downsampled queries.
+    """
+
+    def __init__(self, capacity=TELEMETRY_CAPACITY):
+        """Allocate the ring."""
+        self._capacity = capacity
+        self._timestamps = array("d", bytes(8 * capacity))
+        self._fps = array("f", bytes(4 * capacity))
+        self._latency = array("f", bytes(4 * capacity))
+        self._streaming = array("B", bytes(capacity))
+        self._errors = array("B", bytes(capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        """Return the number of samples held."""
+        return self._count
+
+    def add(self, timestamp, fps=None, streaming=False, latency=None, error=POLL_OK):
+        """Store a sample, overwriting the oldest once the ring is full."""
+        position = self._next
+        self._timestamps[position] = timestamp
+        self._fps[position] = NAN if fps is None else fps
+        self._latency[position] = NAN if latency is None else latency
+        self._streaming[position] = bool(streaming)
+        self._errors[position] = error
+        self._next = (position + 1) % self._capacity
+        self._count = min(self._count + 1, self._capacity)
+
+    def _position(self, index):
+        """Return the array position of the index-th oldest sample."""
+        return (self._next - self._count + index) % self._capacity
+
+    def query(self, start, end, buckets):
+        """Return the samples between start and end downsampled into buckets.
+
+        fps and latency are reduced to min, max and average per bucket,
+        streaming to the fraction of samples that were streaming and poll
+        outcomes to the number of failed polls. Buckets without samples
+        are None.
+        """
+        width = (end - start) / buckets
+        fps = _Series(buckets)
+        latency = _Series(buckets)
+        samples = [0] * buckets
+        streaming = [0] * buckets
+        errors = [0] * buckets
+
+        first = bisect.bisect_left(
+            range(self._count), start, key=lambda index: self._timestamps[self._position(index)]
+        )
+        for index in range(first, self._count):
+            position = self._position(index)
+            timestamp = self._timestamps[position]
+            if timestamp >= end:
+                break
+            bucket = min(int((timestamp - start) / width), buckets - 1)
+            samples[bucket] += 1
+            streaming[bucket] += self._streaming[position]
+            errors[bucket] += self._errors[position] != POLL_OK
+            fps.add(bucket, self._fps[position])
+            latency.add(bucket, self._latency[position])
+
+        return {
+            "start": start,
+            "end": end,
+            "bucket": width,
+            "samples": samples,
+            "fps": fps.as_dict(),
+            "latency": latency.as_dict(),
+            "streaming": [
+                round(streaming[bucket] / samples[bucket], 2) if samples[bucket] else None
+                for bucket in range(buckets)
+            ],
+            "errors": [
+                errors[bucket] if samples[bucket] else None for bucket in range(buckets)
+            ],
+        }
+
+
+class _Series:
+    """Per-bucket min, max and sum of one value, missing values skipped."""
+
+    def __init__(self, buckets):
+        """Initialize empty buckets."""
+        self.minimum = [math.inf] * buckets
+        self.maximum = [-math.inf] * buckets
+        self.total = [0.0] * buckets
+        self.count = [0] * buckets
+
+    def add(self, bucket, value):
+        """Add a value to a bucket, unless it is missing (NaN)."""
+        if math.isnan(value):
+            return
+        self.minimum[bucket] = min(self.minimum[bucket], value)
+        self.maximum[bucket] = max(self.maximum[bucket], value)
+        self.total[bucket] += value
+        self.count[bucket] += 1
+
+    def as_dict(self):
+        """Return the min, max and avg lists, None where a bucket is empty."""
+        buckets = range(len(self.count))
+        return {
+            "min": [round(self.minimum[b], 2) if self.count[b] else None for b in buckets],
+            "max": [round(self.maximum[b], 2) if self.count[b] else None for b in buckets],
+            "avg": [
+                round(self.total[b] / self.count[b], 2) if self.count[b] else None
+                for b in buckets
+            ],
+        }
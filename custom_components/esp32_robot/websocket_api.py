@@ -0,0 +1,135 @@
+"""WebSocket API for ESP32 Robot."""
+import logging
+import time
+
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import callback
+from homeassistant.helpers import config_validation as cv
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+JOYSTICK_AXIS = vol.All(vol.Coerce(float), vol.Range(min=-1, max=1))
+
+# Longest telemetry window a query may ask for
+MAX_TELEMETRY_WINDOW = 24 * 60 * 60  # seconds
+
+
+@callback
+def async_register_websocket_commands(hass):
+    """Register the ESP32 Robot WebSocket commands."""
+    websocket_api.async_register_command(hass, websocket_control)
+    websocket_api.async_register_command(hass, websocket_subscribe_status)
+    websocket_api.async_register_command(hass, websocket_telemetry)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "esp32_robot/control",
+        vol.Required("entity_id"): cv.entity_id,
+        vol.Required("x"): JOYSTICK_AXIS,
+        vol.Required("y"): JOYSTICK_AXIS,
+    }
+)
+@callback
+def websocket_control(hass, connection, msg):
+    """Queue a joystick vector for a robot.
+
+    The result is sent as soon as the vector is queued in the robot's
+    command scheduler, vectors arriving faster than the control rate
+    replace each other.
+    """
+    route = hass.data[DOMAIN]["router"].async_get_by_entity_id(msg["entity_id"])
+    if route is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Robot not found")
+        return
+
+    if not route.online:
+        connection.send_error(msg["id"], "robot_offline", "Robot is offline")
+        return
+
+    route.robot["commands"].submit_control(
+        {"mode": "joystick", "x": round(msg["x"], 2), "y": round(msg["y"], 2)}
+    )
+    route.robot["coordinator"].async_mark_active()
+    connection.send_result(msg["id"])
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "esp32_robot/subscribe_status",
+        vol.Required("entity_id"): cv.entity_id,
+    }
+)
+@callback
+def websocket_subscribe_status(hass, connection, msg):
+    """Push the robot status from the coordinator to a card.
+
+    The first event carries the full status, later events only the keys that
+    changed (removed keys are sent as None). No request is made to the robot
+    on behalf of the subscriber, but the coordinator polls faster while at
+    least one subscriber is attached.
+    """
+    route = hass.data[DOMAIN]["router"].async_get_by_entity_id(msg["entity_id"])
+    if route is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Robot not found")
+        return
+
+    coordinator = route.robot["coordinator"]
+    last_sent = dict(coordinator.data or {})
+
+    @callback
+    def _async_status_updated():
+        nonlocal last_sent
+        status = coordinator.data or {}
+        delta = {key: value for key, value in status.items() if last_sent.get(key) != value}
+        delta.update((key, None) for key in last_sent.keys() - status.keys())
+        if not delta:
+            return
+        last_sent = dict(status)
+        connection.send_message(websocket_api.event_message(msg["id"], {"status": delta}))
+
+    remove_listener = coordinator.async_add_listener(_async_status_updated)
+    remove_subscriber = coordinator.async_add_status_subscriber()
+
+    @callback
+    def _async_unsubscribe():
+        remove_listener()
+        remove_subscriber()
+
+    connection.subscriptions[msg["id"]] = _async_unsubscribe
+    connection.send_result(msg["id"])
+    connection.send_message(websocket_api.event_message(msg["id"], {"status": last_sent}))
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "esp32_robot/telemetry",
+        vol.Required("entity_id"): cv.entity_id,
+        vol.Optional("window", default=300): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=MAX_TELEMETRY_WINDOW)
+        ),
+        vol.Optional("buckets", default=60): vol.All(int, vol.Range(min=1, max=1000)),
+    }
+)
+@callback
+def websocket_telemetry(hass, connection, msg):
+    """Return the robot's recent status history, downsampled for sparklines.
+
+    Covers the last `window` seconds split into `buckets` buckets, each with
+    min/max/avg of fps and poll latency (ms), the fraction of polls that saw
+    the robot streaming and the number of failed polls.
+    """
+    route = hass.data[DOMAIN]["router"].async_get_by_entity_id(msg["entity_id"])
+    if route is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Robot not found")
+        return
+
+    end = time.time()
+    connection.send_result(
+        msg["id"],
+        route.robot["coordinator"].telemetry.query(end - msg["window"], end, msg["buckets"]),
+    )
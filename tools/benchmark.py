@@ -0,0 +1,455 @@
+"""Load test for the ESP32 Robot proxy and status coordinator.
+
+Drives a running Home Assistant instance, whose ESP32 Robot entry points at
+a robot (usually tools/fake_robot.py), with concurrent stream viewers,
+joystick clients and status readers, and records:
+
+- stream throughput and time to first frame
+- control latency (p50/p99): until Home Assistant acknowledged a vector
+  (queued for --control-transport ws, answered by the robot for http), and
+  with --robot until it actually reached the robot (actuation)
+- status latency (p50/p99)
+- CPU and memory of the Home Assistant process over time (Linux /proc)
+- what reached the robot: status polls, upstream streams, control commands
+
+    sudo python tools/fake_robot.py --host 127.0.0.2 &
+    python tools/benchmark.py --url http://127.0.0.1:8123 --token $HA_TOKEN \\
+        --entity sensor.esp32_robot_127_0_0_2 --robot http://127.0.0.2 \\
+        --pid $(pgrep -f "python -m homeassistant") --viewers 20 --joysticks 4 \\
+        --output results.json --baseline previous.json
+
+Results are saved as JSON so runs of different commits can be compared with
+--baseline. Only aiohttp is required.
+"""
+import argparse
+import asyncio
+import bisect
+import datetime
+import json
+import math
+import os
+import subprocess
+import time
+
+import aiohttp
+
+# Metrics compared against a baseline: path in the results and whether
+# lower values are better
+COMPARED_METRICS = (
+    ("stream.throughput_fps", False),
+    ("stream.time_to_first_frame.p99", True),
+    ("control.ack_latency.p50", True),
+    ("control.ack_latency.p99", True),
+    ("control.actuation_latency.p50", True),
+    ("control.actuation_latency.p99", True),
+    ("status.latency.p50", True),
+    ("status.latency.p99", True),
+    ("process.cpu_percent_per_viewer", True),
+    ("process.rss_max_mb", True),
+)
+
+
+def percentiles(values):
+    """Return p50, p99 and max of a list of durations in ms."""
+    if not values:
+        return {"count": 0, "p50": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def rank(fraction):
+        return round(ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)], 2)
+
+    return {"count": len(ordered), "p50": rank(0.5), "p99": rank(0.99), "max": round(ordered[-1], 2)}
+
+
+class ProcessSampler:
+    """CPU time and resident memory of a process, read from /proc."""
+
+    def __init__(self, pid):
+        """Initialize the sampler for pid."""
+        self.pid = pid
+        self._ticks = os.sysconf("SC_CLK_TCK")
+        self._page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def cpu_seconds(self):
+        """Return user plus system CPU seconds used so far."""
+        with open(f"/proc/{self.pid}/stat") as file:
+            # The command name may contain spaces, fields follow its ")"
+            fields = file.read().rpartition(")")[2].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+    def rss_mb(self):
+        """Return the resident set size in MiB."""
+        with open(f"/proc/{self.pid}/statm") as file:
+            return int(file.read().split()[1]) * self._page_size / 1024 / 1024
+
+
+class Benchmark:
+    """One benchmark run."""
+
+    def __init__(self, args):
+        """Initialize the counters."""
+        self.args = args
+        self.sensor_id = args.entity.split(".", 1)[1]
+        self.headers = {"Authorization": f"Bearer {args.token}"}
+        self.stopping = asyncio.Event()
+        self.viewer_frames = [0] * args.viewers
+        self.viewer_bytes = 0
+        self.first_frame = []
+        self.stream_errors = 0
+        self.control_latency = []
+        self.control_sends = []
+        self.control_sent = 0
+        self.control_errors = 0
+        self.status_latency = []
+        self.status_errors = 0
+        self.samples = []
+
+    def proxy_url(self, path):
+        """Return the proxy URL of a robot path."""
+        return f"{self.args.url}/api/esp32_robot/proxy/{self.sensor_id}/{path}"
+
+    async def viewer(self, session, number):
+        """Watch the stream and count frames."""
+        started = time.monotonic()
+        try:
+            async with session.get(self.proxy_url("stream"), headers=self.headers) as response:
+                response.raise_for_status()
+                boundary = response.headers["Content-Type"].partition("boundary=")[2]
+                delimiter = b"--" + boundary.strip('"').encode()
+                tail = b""
+                async for chunk in response.content.iter_any():
+                    if self.stopping.is_set():
+                        break
+                    data = tail + chunk
+                    frames = data.count(delimiter)
+                    # Short of a whole delimiter, so none is counted twice
+                    tail = data[-(len(delimiter) - 1):]
+                    if frames and not self.viewer_frames[number]:
+                        self.first_frame.append((time.monotonic() - started) * 1000)
+                    self.viewer_frames[number] += frames
+                    self.viewer_bytes += len(chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError):
+            self.stream_errors += 1
+
+    async def joystick_ws(self, session, number):
+        """Send joystick vectors over the WebSocket API and time the results."""
+        try:
+            async with session.ws_connect(f"{self.args.url}/api/websocket") as ws:
+                await ws.receive_json()  # auth_required
+                await ws.send_json({"type": "auth", "access_token": self.args.token})
+                if (await ws.receive_json())["type"] != "auth_ok":
+                    raise aiohttp.ClientError("authentication failed")
+
+                pending = {}
+
+                async def _receive():
+                    async for message in ws:
+                        result = json.loads(message.data)
+                        sent = pending.pop(result.get("id"), None)
+                        if sent is None:
+                            continue
+                        if result.get("success"):
+                            self.control_latency.append((time.monotonic() - sent) * 1000)
+                        else:
+                            self.control_errors += 1
+
+                receiver = asyncio.create_task(_receive())
+                message_id = 0
+                async for x, y in self.vectors(number):
+                    message_id += 1
+                    pending[message_id] = time.monotonic()
+                    self.record_send(x, y)
+                    await ws.send_json(
+                        {"id": message_id, "type": "esp32_robot/control",
+                         "entity_id": self.args.entity, "x": x, "y": y}
+                    )
+                await asyncio.sleep(1)
+                receiver.cancel()
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError):
+            self.control_errors += 1
+
+    async def joystick_http(self, session, number):
+        """Send joystick vectors as POST /control through the proxy."""
+        async for x, y in self.vectors(number):
+            self.record_send(x, y)
+            await self.timed_request(
+                session, "post", "control", self.control_latency, "control_errors",
+                json={"mode": "joystick", "x": x, "y": y},
+            )
+
+    def record_send(self, x, y):
+        """Count a vector and remember when it was sent, for actuation latency."""
+        self.control_sent += 1
+        self.control_sends.append((time.time(), x, y))
+
+    def actuation_latency(self, arrivals):
+        """Return the delay in ms from sending each vector to its /control arrival.
+
+        Arrivals are matched to the latest earlier send of the same vector.
+        Stops are left out, every joystick sends the same one. Vectors the
+        scheduler superseded or dropped never arrive and are not counted.
+        """
+        sends = {}
+        for sent, x, y in self.control_sends:
+            if (x, y) != (0, 0):
+                sends.setdefault((x, y), []).append(sent)
+        latencies = []
+        for arrived, x, y in arrivals:
+            times = sends.get((x, y))
+            if not times:
+                continue
+            index = bisect.bisect_right(times, arrived) - 1
+            if index >= 0:
+                latencies.append((arrived - times[index]) * 1000)
+        return latencies
+
+    async def robot_controls(self, session, since):
+        """Return the /control arrivals at the fake robot since a wall-clock time."""
+        if not self.args.robot:
+            return None
+        try:
+            async with session.get(
+                f"{self.args.robot}/_controls", params={"since": since}
+            ) as response:
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return None
+
+    async def vectors(self, number):
+        """Yield joystick vectors at the control rate until the run ends."""
+        interval = 1 / self.args.control_rate
+        phase = number
+        while not self.stopping.is_set():
+            phase += interval
+            yield round(math.sin(phase), 2), round(math.cos(phase), 2)
+            await asyncio.sleep(interval)
+        yield 0, 0
+
+    async def status_reader(self, session):
+        """Read the status through the proxy at a fixed interval."""
+        while not self.stopping.is_set():
+            await self.timed_request(session, "get", "status", self.status_latency, "status_errors")
+            await asyncio.sleep(self.args.status_interval)
+
+    async def timed_request(self, session, method, path, latencies, error_counter, **kwargs):
+        """Make one proxy request and record its latency."""
+        started = time.monotonic()
+        try:
+            async with session.request(
+                method, self.proxy_url(path), headers=self.headers, **kwargs
+            ) as response:
+                await response.read()
+                if response.status >= 400:
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, (), status=response.status
+                    )
+            latencies.append((time.monotonic() - started) * 1000)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            setattr(self, error_counter, getattr(self, error_counter) + 1)
+
+    async def robot_stats(self, session):
+        """Return the counters of the fake robot, if one is configured."""
+        if not self.args.robot:
+            return None
+        try:
+            async with session.get(f"{self.args.robot}/_stats") as response:
+                return await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def sample(self, sampler, started):
+        """Record CPU and memory of Home Assistant every second."""
+        last_cpu = sampler.cpu_seconds() if sampler else None
+        last_time = time.monotonic()
+        while not self.stopping.is_set():
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            sample = {
+                "t": round(now - started, 1),
+                "frames": sum(self.viewer_frames),
+                "commands": len(self.control_latency),
+            }
+            if sampler is not None:
+                cpu = sampler.cpu_seconds()
+                sample["cpu_percent"] = round((cpu - last_cpu) / (now - last_time) * 100, 1)
+                sample["rss_mb"] = round(sampler.rss_mb(), 1)
+                last_cpu = cpu
+            last_time = now
+            self.samples.append(sample)
+
+    async def run(self):
+        """Run all workloads for the configured duration and return the results."""
+        args = self.args
+        sampler = ProcessSampler(args.pid) if args.pid else None
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            robot_before = await self.robot_stats(session)
+            wall_started = time.time()
+            joystick = self.joystick_ws if args.control_transport == "ws" else self.joystick_http
+            started = time.monotonic()
+            tasks = [
+                *(asyncio.create_task(self.viewer(session, n)) for n in range(args.viewers)),
+                *(asyncio.create_task(joystick(session, n)) for n in range(args.joysticks)),
+                *(asyncio.create_task(self.status_reader(session)) for _ in range(args.status_clients)),
+                asyncio.create_task(self.sample(sampler, started)),
+            ]
+            await asyncio.sleep(args.duration)
+            self.stopping.set()
+            elapsed = time.monotonic() - started
+            await asyncio.wait(tasks, timeout=5)
+            for task in tasks:
+                task.cancel()
+            robot_after = await self.robot_stats(session)
+            arrivals = await self.robot_controls(session, wall_started)
+
+        return self.results(elapsed, robot_before, robot_after, arrivals)
+
+    def results(self, elapsed, robot_before, robot_after, arrivals=None):
+        """Assemble the results of the run."""
+        args = self.args
+        frames = sum(self.viewer_frames)
+        cpu = [sample["cpu_percent"] for sample in self.samples if "cpu_percent" in sample]
+        rss = [sample["rss_mb"] for sample in self.samples if "rss_mb" in sample]
+        cpu_mean = sum(cpu) / len(cpu) if cpu else None
+        config = {key: value for key, value in vars(args).items() if key not in ("token", "baseline")}
+
+        results = {
+            "version": 1,
+            "commit": git_commit(),
+            "started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "duration": round(elapsed, 1),
+            "config": config,
+            "stream": {
+                "viewers": args.viewers,
+                "frames": frames,
+                "throughput_fps": round(frames / elapsed, 1),
+                "fps_per_viewer": round(frames / elapsed / args.viewers, 1) if args.viewers else None,
+                "bytes_per_second": round(self.viewer_bytes / elapsed),
+                "time_to_first_frame": percentiles(self.first_frame),
+                "errors": self.stream_errors,
+            },
+            "control": {
+                "clients": args.joysticks,
+                "transport": args.control_transport,
+                "sent": self.control_sent,
+                "commands_per_second": round(len(self.control_latency) / elapsed, 1),
+                # With WebSocket the result comes once the vector is queued,
+                # before it is sent to the robot
+                "ack": "queued" if args.control_transport == "ws" else "robot response",
+                "ack_latency": percentiles(self.control_latency),
+                "actuation_latency": (
+                    percentiles(self.actuation_latency(arrivals)) if arrivals is not None else None
+                ),
+                "errors": self.control_errors,
+            },
+            "status": {
+                "clients": args.status_clients,
+                "latency": percentiles(self.status_latency),
+                "errors": self.status_errors,
+            },
+            "process": {
+                "cpu_percent_mean": round(cpu_mean, 1) if cpu_mean is not None else None,
+                "cpu_percent_per_viewer": (
+                    round(cpu_mean / args.viewers, 2) if cpu_mean is not None and args.viewers else None
+                ),
+                "rss_start_mb": rss[0] if rss else None,
+                "rss_end_mb": rss[-1] if rss else None,
+                "rss_max_mb": max(rss) if rss else None,
+            },
+            "samples": self.samples,
+        }
+
+        if robot_before is not None and robot_after is not None:
+            requests_before = robot_before["requests"]
+            requests_after = robot_after["requests"]
+
+            def _requests(path):
+                return requests_after.get(path, 0) - requests_before.get(path, 0)
+
+            results["robot"] = {
+                "status_polls_per_second": round(_requests("/status") / elapsed, 2),
+                "stream_connections": _requests("/stream"),
+                "max_streams": robot_after["max_streams_seen"],
+                "control_requests_per_second": round(_requests("/control") / elapsed, 1),
+                "frames_sent": robot_after["frames_sent"] - robot_before["frames_sent"],
+                "rejected": robot_after["rejected"] - robot_before["rejected"],
+                "max_connections": robot_after["max_connections_seen"],
+            }
+        return results
+
+
+def git_commit():
+    """Return the current commit of the checkout, if there is one."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def lookup(results, path):
+    """Return a nested value by dotted path, or None."""
+    for key in path.split("."):
+        if not isinstance(results, dict):
+            return None
+        results = results.get(key)
+    return results
+
+
+def compare(baseline, results):
+    """Print the change of the key metrics against a baseline run."""
+    print(f"{'metric':<36}{'baseline':>12}{'current':>12}{'change':>10}")
+    for path, lower_is_better in COMPARED_METRICS:
+        before, after = lookup(baseline, path), lookup(results, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change > 0 if lower_is_better else change < 0
+        marker = " !" if worse and abs(change) >= 10 else ""
+        print(f"{path:<36}{before:>12}{after:>12}{change:>+9.1f}%{marker}")
+
+
+def parse_args(argv=None):
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8123", help="Home Assistant URL")
+    parser.add_argument("--token", default=os.environ.get("HA_TOKEN"),
+                        help="long-lived access token (default: $HA_TOKEN)")
+    parser.add_argument("--entity", required=True, help="sensor entity id of the robot")
+    parser.add_argument("--robot", help="URL of the fake robot, for its counters")
+    parser.add_argument("--pid", type=int, help="pid of Home Assistant, for CPU and memory")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--viewers", type=int, default=10)
+    parser.add_argument("--joysticks", type=int, default=1)
+    parser.add_argument("--control-rate", type=float, default=20, help="vectors per second per joystick")
+    parser.add_argument("--control-transport", choices=("ws", "http"), default="ws")
+    parser.add_argument("--status-clients", type=int, default=1)
+    parser.add_argument("--status-interval", type=float, default=0.5, help="seconds")
+    parser.add_argument("--output", help="file to save the results to")
+    parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    args = parser.parse_args(argv)
+    if not args.token:
+        parser.error("--token or $HA_TOKEN is required")
+    return args
+
+
+def main():
+    """Run the benchmark."""
+    args = parse_args()
+    results = asyncio.run(Benchmark(args).run())
+
+    summary = {key: value for key, value in results.items() if key != "samples"}
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(json.load(file), results)
+
+
+if __name__ == "__main__":
+    main()
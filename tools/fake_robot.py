@@ -0,0 +1,321 @@
+"""Stand-in for the ESP32 Robot firmware, for benchmarks and development.
+
+Serves the robot's HTTP API (/status, /stream, /stopstream, /control,
+/quality, /led, /camera/settings) with configurable frame rate, resolution,
+latency, jitter, dropped requests and a limit on concurrent connections
+like the handful of sockets an ESP32 has. Counters are served on /_stats
+for the benchmark harness, and the arrival time of every /control command
+on /_controls, so the harness can measure actuation latency.
+
+    sudo python tools/fake_robot.py --host 127.0.0.2 --count 4 --fps 15 --resolution VGA
+
+The integration reaches robots on port 80 of their IP address, so each
+robot listens on port 80 of its own loopback address (127.0.0.2, 127.0.0.3,
+...), which needs root or CAP_NET_BIND_SERVICE.
+
+Only aiohttp is required. With Pillow installed the stream carries real
+JPEG images, otherwise frames are JPEG-sized filler between SOI and EOI
+markers, which is all the proxy looks at.
+"""
+import argparse
+import asyncio
+import collections
+import ipaddress
+import logging
+import random
+import time
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger("fake_robot")
+
+RESOLUTIONS = {
+    "QQVGA": (160, 120),
+    "QCIF": (176, 144),
+    "HQVGA": (240, 176),
+    "240X240": (240, 240),
+    "QVGA": (320, 240),
+    "CIF": (400, 296),
+    "HVGA": (480, 320),
+    "VGA": (640, 480),
+    "SVGA": (800, 600),
+    "XGA": (1024, 768),
+    "HD": (1280, 720),
+    "SXGA": (1280, 1024),
+    "UXGA": (1600, 1200),
+}
+
+# Boundary used by the esp32-camera web server example
+STREAM_BOUNDARY = "123456789000000000000987654321"
+
+# Distinct frames rendered per resolution and quality, cycled in the stream
+FRAME_VARIANTS = 8
+
+# /control arrivals kept for /_controls
+CONTROL_HISTORY = 100000
+
+
+def render_frames(resolution, quality):
+    """Return FRAME_VARIANTS JPEG frames for a resolution and quality (0-63)."""
+    width, height = RESOLUTIONS[resolution]
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        # The camera's quality scale runs from 0 (best) to 63, roughly
+        # 0.5 bytes per pixel at 10 and a tenth of that at 63
+        size = int(width * height * 0.5 * 10 / max(quality, 10))
+        return [
+            b"\xff\xd8" + bytes([variant]) * size + b"\xff\xd9"
+            for variant in range(FRAME_VARIANTS)
+        ]
+
+    import io
+
+    frames = []
+    for variant in range(FRAME_VARIANTS):
+        image = Image.effect_noise((width, height), 32 + variant * 8).convert("RGB")
+        ImageDraw.Draw(image).text((8, 8), f"fake robot {variant}", fill=(255, 255, 0))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=max(5, int(100 - quality * 1.5)))
+        frames.append(buffer.getvalue())
+    return frames
+
+
+class FakeRobot:
+    """One fake robot listening on its own port."""
+
+    def __init__(self, args):
+        """Initialize the robot state from the command line options."""
+        self.args = args
+        self.resolution = args.resolution
+        self.quality = args.quality
+        self.led_brightness = 0
+        self.frames = render_frames(self.resolution, self.quality)
+        self.streams = 0
+        self.connections = 0
+        self.stats = {
+            "requests": {},
+            "rejected": 0,
+            "dropped": 0,
+            "frames_sent": 0,
+            "frames_skipped": 0,
+            "bytes_sent": 0,
+            "max_connections_seen": 0,
+            "max_streams_seen": 0,
+            "last_control": None,
+        }
+        self._frame_times = []
+        self.control_arrivals = collections.deque(maxlen=CONTROL_HISTORY)
+
+    def application(self):
+        """Return the aiohttp application serving the robot API."""
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/status", self.status)
+        app.router.add_get("/stream", self.stream)
+        app.router.add_get("/stopstream", self.stopstream)
+        app.router.add_post("/control", self.control)
+        app.router.add_get("/quality", self.quality_handler)
+        app.router.add_get("/led", self.led)
+        app.router.add_get("/camera/settings", self.camera_settings)
+        app.router.add_get("/_stats", self.stats_handler)
+        app.router.add_get("/_controls", self.controls_handler)
+        return app
+
+    async def _delay(self):
+        """Wait the configured latency plus jitter."""
+        delay = self.args.latency + random.uniform(-self.args.jitter, self.args.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        """Count requests and apply connection limits, drops and latency."""
+        if request.path in ("/_stats", "/_controls"):
+            return await handler(request)
+
+        requests = self.stats["requests"]
+        requests[request.path] = requests.get(request.path, 0) + 1
+
+        if self.connections >= self.args.max_connections:
+            # The ESP32 runs out of sockets and resets the connection
+            self.stats["rejected"] += 1
+            request.transport.close()
+            raise web.HTTPServiceUnavailable()
+
+        if random.random() < self.args.drop_rate:
+            self.stats["dropped"] += 1
+            request.transport.close()
+            raise web.HTTPServiceUnavailable()
+
+        self.connections += 1
+        self.stats["max_connections_seen"] = max(
+            self.stats["max_connections_seen"], self.connections
+        )
+        try:
+            await self._delay()
+            return await handler(request)
+        finally:
+            self.connections -= 1
+
+    def _measured_fps(self):
+        """Return the frame rate sent over the last second."""
+        now = time.monotonic()
+        self._frame_times = [t for t in self._frame_times if now - t < 1]
+        return float(len(self._frame_times))
+
+    async def status(self, request):
+        """Return the robot status like the firmware does."""
+        return web.json_response(
+            {"fps": self._measured_fps(), "streaming": self.streams > 0}
+        )
+
+    async def stream(self, request):
+        """Send an MJPEG stream at the configured frame rate."""
+        response = web.StreamResponse()
+        response.headers["Content-Type"] = (
+            f"multipart/x-mixed-replace;boundary={STREAM_BOUNDARY}"
+        )
+        await response.prepare(request)
+
+        self.streams += 1
+        self.stats["max_streams_seen"] = max(self.stats["max_streams_seen"], self.streams)
+        interval = 1 / self.args.fps
+        next_frame = time.monotonic()
+        variant = 0
+        try:
+            while True:
+                next_frame += interval
+                jitter = random.uniform(0, self.args.jitter) / 1000
+                await asyncio.sleep(max(0, next_frame - time.monotonic()) + jitter)
+
+                if random.random() < self.args.frame_drop_rate:
+                    self.stats["frames_skipped"] += 1
+                    continue
+
+                frame = self.frames[variant % len(self.frames)]
+                variant += 1
+                part = (
+                    f"\r\n--{STREAM_BOUNDARY}\r\n"
+                    f"Content-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(frame)}\r\n\r\n"
+                ).encode() + frame
+                await response.write(part)
+                self.stats["frames_sent"] += 1
+                self.stats["bytes_sent"] += len(part)
+                self._frame_times.append(time.monotonic())
+        except ConnectionResetError:
+            pass
+        finally:
+            self.streams -= 1
+        return response
+
+    async def stopstream(self, request):
+        """Acknowledge a stream stop, streams end when the client leaves."""
+        return web.json_response({"status": "ok"})
+
+    async def control(self, request):
+        """Accept a joystick vector."""
+        try:
+            payload = await request.json()
+        except ValueError:
+            return web.json_response({"error": "invalid json"}, status=400)
+        self.stats["last_control"] = payload
+        # Wall clock, comparable with the sender's when both run on one host
+        self.control_arrivals.append((time.time(), payload.get("x"), payload.get("y")))
+        return web.json_response({"status": "ok"})
+
+    async def quality_handler(self, request):
+        """Change resolution and JPEG quality."""
+        resolution = request.query.get("resolution", self.resolution)
+        if resolution not in RESOLUTIONS:
+            return web.json_response({"error": "unknown resolution"}, status=400)
+        try:
+            quality = int(request.query.get("quality", self.quality))
+        except ValueError:
+            return web.json_response({"error": "invalid quality"}, status=400)
+        if (resolution, quality) != (self.resolution, self.quality):
+            self.resolution, self.quality = resolution, quality
+            self.frames = render_frames(resolution, quality)
+        return web.json_response({"status": "ok"})
+
+    async def led(self, request):
+        """Change the LED brightness."""
+        try:
+            self.led_brightness = max(0, min(100, int(request.query["brightness"])))
+        except (KeyError, ValueError):
+            return web.json_response({"error": "invalid brightness"}, status=400)
+        return web.json_response({"status": "ok"})
+
+    async def camera_settings(self, request):
+        """Return the current camera and LED settings."""
+        return web.json_response(
+            {
+                "resolution": self.resolution,
+                "quality": self.quality,
+                "led_brightness": self.led_brightness,
+            }
+        )
+
+    async def controls_handler(self, request):
+        """Return [time, x, y] of the /control commands received since ?since=."""
+        since = float(request.query.get("since", 0))
+        return web.json_response(
+            [arrival for arrival in self.control_arrivals if arrival[0] >= since]
+        )
+
+    async def stats_handler(self, request):
+        """Return the counters of this fake robot."""
+        return web.json_response(
+            {
+                **self.stats,
+                "connections": self.connections,
+                "streams": self.streams,
+                "frame_size": len(self.frames[0]),
+            }
+        )
+
+
+def parse_args(argv=None):
+    """Parse the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.2", help="address of the first robot")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--count", type=int, default=1, help="robots on consecutive addresses")
+    parser.add_argument("--fps", type=float, default=15)
+    parser.add_argument("--resolution", choices=RESOLUTIONS, default="VGA")
+    parser.add_argument("--quality", type=int, default=12, help="0 (best) to 63")
+    parser.add_argument("--latency", type=float, default=0, help="ms added to every request")
+    parser.add_argument("--jitter", type=float, default=0, help="ms of random latency, +/-")
+    parser.add_argument("--drop-rate", type=float, default=0,
+                        help="fraction of requests answered by closing the connection")
+    parser.add_argument("--frame-drop-rate", type=float, default=0,
+                        help="fraction of stream frames not sent")
+    parser.add_argument("--max-connections", type=int, default=7,
+                        help="concurrent connections before new ones are reset")
+    return parser.parse_args(argv)
+
+
+async def async_main(args):
+    """Start the robots and serve until interrupted."""
+    runners = []
+    first = ipaddress.ip_address(args.host)
+    for number in range(args.count):
+        host = str(first + number)
+        runner = web.AppRunner(FakeRobot(args).application(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, args.port).start()
+        runners.append(runner)
+        _LOGGER.info("Fake robot listening on http://%s:%d", host, args.port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(async_main(parse_args()))
+    except KeyboardInterrupt:
+        pass